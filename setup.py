@@ -17,10 +17,14 @@ setup(
     version="0.0.16",
     package_dir={"": "src"},
     packages=find_packages("src"),
-    entry_points={"tox": ["current-env = tox_current_env.hooks"]},
+    entry_points={
+        "tox": ["current-env = tox_current_env.hooks"],
+        "console_scripts": ["tox-current-env = tox_current_env.__main__:main"],
+    },
     install_requires=[
         "tox>=3.28",
-        "importlib_metadata; python_version < '3.8'"
+        "importlib_metadata; python_version < '3.8'",
+        "packaging",
     ],
     extras_require={
         "tests": [
@@ -0,0 +1,10 @@
+__all__ = ["EnvResult", "Resolver", "resolve"]
+
+
+def __getattr__(name):
+    # tox imports this package in every run, the API is only imported when used
+    if name in __all__:
+        from tox_current_env import api
+
+        return getattr(api, name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
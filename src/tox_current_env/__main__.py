@@ -0,0 +1,163 @@
+"""The tox-current-env command, to use the plugin without running tox"""
+
+import argparse
+import json
+import sys
+
+
+def add_print_options(parser):
+    for what, desc in (
+        ("deps", "the dependencies"),
+        ("extras", "the names of the required extras"),
+        ("dependency-groups", "the names of the required dependency-groups"),
+        ("manifest", "everything above as one JSON line per environment"),
+    ):
+        parser.add_argument(
+            f"--print-{what}-to",
+            f"--print-{what}-to-file",
+            action="store",
+            type=argparse.FileType("w"),
+            metavar="FILE",
+            default=None,
+            help=f"Print {desc} to the given file (use `-` for stdout)",
+        )
+
+
+PRINT_OPTIONS = (
+    "print_deps_to",
+    "print_extras_to",
+    "print_dependency_groups_to",
+    "print_manifest_to",
+)
+
+
+def check_print_options(parser, args):
+    exclusive = [getattr(getattr(args, o), "name", object()) for o in PRINT_OPTIONS]
+    if len(exclusive) != len(set(exclusive)):
+        parser.error("The paths given to --print-*-to options cannot be identical.")
+
+
+def write_results(results, args):
+    """Write the EnvResults the same way tox --print-*-to does"""
+    for name, result in results.items():
+        if args.print_deps_to:
+            print(*result.requires, *result.deps, sep="\n", file=args.print_deps_to)
+        if args.print_extras_to:
+            print(*result.extras, sep="\n", file=args.print_extras_to)
+        if args.print_dependency_groups_to:
+            print(*result.dependency_groups, sep="\n", file=args.print_dependency_groups_to)
+        if args.print_manifest_to:
+            print(json.dumps({"env": name, **result._asdict()}), file=args.print_manifest_to)
+    for f in (getattr(args, o) for o in PRINT_OPTIONS):
+        if f:
+            f.flush()
+
+
+def _envs(value):
+    return [env.strip() for env in value.split(",") if env.strip()]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(prog="tox-current-env", description=__doc__)
+    commands = parser.add_subparsers(dest="command", metavar="COMMAND")
+    commands.required = True
+
+    serve = commands.add_parser(
+        "serve", help="answer queries on a Unix socket until terminated"
+    )
+    serve.add_argument("--socket", required=True, help="path of the Unix socket")
+
+    query = commands.add_parser(
+        "query", help="ask a running server, like tox --print-*-to would"
+    )
+    query.add_argument("--socket", required=True, help="path of the Unix socket")
+    query.add_argument(
+        "-e", dest="envs", type=_envs, default=None,
+        help="comma separated tox environments (default: env_list from the configuration)",
+    )
+    query.add_argument("project_dir", nargs="?", default=".", help="the project directory")
+    add_print_options(query)
+
+    print_ = commands.add_parser(
+        "print",
+        help="like tox --print-*-to, read simple configurations without starting tox",
+    )
+    print_.add_argument(
+        "-e", dest="envs", type=_envs, default=None,
+        help="comma separated tox environments (default: env_list from the configuration)",
+    )
+    print_.add_argument("project_dir", nargs="?", default=".", help="the project directory")
+    add_print_options(print_)
+
+    batch = commands.add_parser(
+        "batch",
+        help="resolve many projects in parallel, write one JSON line per project",
+    )
+    batch.add_argument("project_dirs", nargs="*", metavar="project_dir",
+                       help="the project directories")
+    batch.add_argument(
+        "--discover", action="append", default=[], metavar="ROOT",
+        help="also resolve all projects with a tox configuration under ROOT",
+    )
+    batch.add_argument(
+        "-e", dest="envs", type=_envs, default=None,
+        help="comma separated tox environments (default: env_list from the configuration)",
+    )
+    batch.add_argument(
+        "-j", "--jobs", type=int, default=None,
+        help="number of worker processes (default: number of CPUs)",
+    )
+    batch.add_argument(
+        "--output", type=argparse.FileType("w"), default="-", metavar="FILE",
+        help="where to write the results (default: stdout)",
+    )
+
+    args = parser.parse_args(argv)
+
+    if args.command == "batch":
+        from tox_current_env import batch
+
+        project_dirs = list(args.project_dirs)
+        for root in args.discover:
+            project_dirs.extend(batch.discover(root))
+        failed = False
+        for result in batch.resolve_many(project_dirs, args.envs, args.jobs):
+            failed = failed or "error" in result
+            print(json.dumps(result), file=args.output, flush=True)
+        return int(failed)
+
+    if args.command == "print":
+        from tox_current_env import static
+
+        check_print_options(print_, args)
+        try:
+            results = static.resolve(args.project_dir, args.envs)
+        except static.Unsupported:
+            from tox_current_env.api import resolve
+
+            try:
+                results = resolve(args.project_dir, args.envs, args=("-qq",))
+            except (LookupError, RuntimeError) as e:
+                print(f"tox-current-env: {e}", file=sys.stderr)
+                return 1
+        write_results(results, args)
+        return 0
+
+    from tox_current_env import server
+
+    if args.command == "serve":
+        server.serve(args.socket)
+        return 0
+
+    check_print_options(query, args)
+    try:
+        results = server.query(args.socket, args.project_dir, args.envs)
+    except (OSError, RuntimeError) as e:
+        print(f"tox-current-env: {e}", file=sys.stderr)
+        return 1
+    write_results(results, args)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
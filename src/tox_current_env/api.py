@@ -0,0 +1,84 @@
+"""Python API to get what the --print-*-to options print, without running tox.
+
+    >>> from tox_current_env import resolve
+    >>> resolve("path/to/project", envs=["py312"])
+    {'py312': EnvResult(requires=['tox'], deps=['six', 'py'], extras=['dev', 'full'], dependency_groups=['dg1'])}
+
+The API is only available with tox 4.
+"""
+
+import io
+from pathlib import Path
+from typing import List, NamedTuple
+
+
+class EnvResult(NamedTuple):
+    """What tox --print-*-to would print for one tox environment"""
+
+    requires: List[str]
+    deps: List[str]
+    extras: List[str]
+    dependency_groups: List[str]
+
+
+class Resolver:
+    """tox configuration of one project, loaded once and reusable for many queries.
+
+    envs selects the loaded tox environments like tox -e does
+    (a list of names or "ALL"), by default the env_list from the configuration is used.
+    args are additional tox command line arguments."""
+
+    def __init__(self, project_dir, envs=None, args=()):
+        from tox import __version__ as TOX_VERSION
+
+        if TOX_VERSION[0] != "4":
+            raise RuntimeError("The tox_current_env API requires tox 4.")
+
+        from tox.provision import provision
+        from tox.run import setup_state
+
+        self.project_dir = Path(project_dir).absolute()
+        tox_args = ["-c", str(self.project_dir), "--no-provision"]
+        if envs is not None:
+            tox_args += ["-e", envs if isinstance(envs, str) else ",".join(envs)]
+        self._state = setup_state([*tox_args, *args])
+
+        # Nothing is ever printed to those,
+        # but this makes the plugin load the environments as print-env.
+        options = self._state.conf.options
+        options.print_deps_to = io.StringIO()
+        options.print_extras_to = io.StringIO()
+        options.print_dependency_groups_to = io.StringIO()
+        # The configuration stays loaded in memory, don't write to the project.
+        options.work_dir_cache = False
+        provision(self._state)
+
+    @property
+    def envs(self):
+        """Names of the selected tox environments"""
+        return list(self._state.envs.iter())
+
+    def resolve(self, envs=None):
+        """Return a dict of EnvResults for the given (by default all selected) environments"""
+        names = self.envs if envs is None else list(envs)
+        return {name: self._resolve_env(name) for name in names}
+
+    def _resolve_env(self, name):
+        from tox_current_env.runner4 import PrintEnv
+
+        try:
+            env = self._state.envs[name]
+        except KeyError:
+            raise LookupError(
+                f"tox environment {name} is not loaded, "
+                + f"loaded environments are: {', '.join(self.envs)}"
+            ) from None
+        if not isinstance(env, PrintEnv):
+            raise RuntimeError(f"tox environment {name} uses a different runner.")
+        return env.result()
+
+
+def resolve(project_dir, envs=None, args=()):
+    """Load the tox configuration of project_dir and resolve the given environments,
+    see Resolver for the arguments"""
+    return Resolver(project_dir, envs, args).resolve()
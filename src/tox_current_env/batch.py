@@ -0,0 +1,39 @@
+"""Resolve many projects at once, in a pool of worker processes"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import repeat
+
+from tox_current_env.api import resolve
+
+CONFIG_FILES = ("tox.ini", "tox.toml", "pyproject.toml")
+
+
+def discover(root):
+    """Generate all directories under root with a tox configuration,
+    hidden directories (such as .tox or .git) are skipped"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+        if any(name in filenames for name in CONFIG_FILES):
+            yield dirpath
+
+
+def resolve_project(project_dir, envs=None):
+    """Resolve one project, return a JSON-serializable dict with results or an error"""
+    project_dir = os.path.abspath(project_dir)
+    try:
+        results = resolve(project_dir, envs, args=("-qq",))
+    except (Exception, SystemExit) as e:
+        # tox reports some problems (such as invalid arguments) by exiting
+        return {"project_dir": project_dir, "error": f"{type(e).__name__}: {e}"}
+    return {
+        "project_dir": project_dir,
+        "results": {name: result._asdict() for name, result in results.items()},
+    }
+
+
+def resolve_many(project_dirs, envs=None, workers=None):
+    """Generate resolve_project() results for all project_dirs, in the given order.
+    By default, there is one worker process per CPU."""
+    with ProcessPoolExecutor(max_workers=workers or os.cpu_count()) as pool:
+        yield from pool.map(resolve_project, project_dirs, repeat(envs))
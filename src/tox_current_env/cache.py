@@ -0,0 +1,70 @@
+"""Small JSON files in the tox work dir, used to remember expensive results
+between tox invocations. Every file holds a key and a value;
+the value is only returned if the stored key matches the requested one."""
+
+import json
+import os
+import threading
+
+from tox_current_env import trace
+
+CACHE_DIRNAME = ".current-env"
+
+
+def cache_path(work_dir, name):
+    """Path of the cache file called name in the given tox work dir"""
+    return os.path.join(str(work_dir), CACHE_DIRNAME, name)
+
+
+def _normalized(key):
+    # What we compare must survive the JSON round trip (tuples become lists etc.)
+    return json.loads(json.dumps(key, sort_keys=True))
+
+
+def load(path, key):
+    """Return the value stored in path under key or None"""
+    try:
+        with trace.span("cache.load", "filesystem", path=path), open(
+            path, encoding="utf-8"
+        ) as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if not isinstance(data, dict) or data.get("key") != _normalized(key):
+        return None
+    return data.get("value")
+
+
+def store(path, key, value):
+    """Atomically store value under key in path, errors are ignored,
+    as the cache is only an optimization"""
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with trace.span("cache.store", "filesystem", path=path):
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(tmp, "w", encoding="utf-8") as f:
+                json.dump({"key": _normalized(key), "value": value}, f)
+            os.replace(tmp, path)
+    except OSError:
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
+
+
+def plugin_version():
+    """Version of tox-current-env, to invalidate caches after upgrades"""
+    global _plugin_version
+    if _plugin_version is None:
+        try:
+            import importlib.metadata as importlib_metadata
+        except ImportError:
+            import importlib_metadata
+        try:
+            _plugin_version = importlib_metadata.version("tox-current-env")
+        except importlib_metadata.PackageNotFoundError:
+            _plugin_version = "unknown"
+    return _plugin_version
+
+
+_plugin_version = None
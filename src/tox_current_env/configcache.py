@@ -0,0 +1,126 @@
+"""Fully evaluated tox configuration values of the environments, stored in the tox work dir.
+
+Evaluating factors and substitutions for every environment is the slowest part
+of a --print-*-to run. The values this plugin uses are stored per environment and
+reused until the configuration files, the environment variables they reference,
+the command line, tox or this plugin change."""
+
+import hashlib
+import os
+import re
+import sys
+
+from tox_current_env import cache, trace
+
+CONFIG_FILES = ("tox.ini", "tox.toml", "pyproject.toml", "setup.cfg")
+
+_ENV_REFERENCE_RES = (
+    re.compile(r"\{env:([^:}]+)"),  # tox.ini: {env:NAME} or {env:NAME:default}
+    re.compile(r"""\bname\s*=\s*["']([^"']+)["']"""),  # TOML: {replace = "env", name = "NAME"}
+)
+
+# (path, st_mtime_ns, st_size) -> (sha256, referenced environment variables)
+_file_info = {}
+
+# (work dir, env name) -> ResolvedConfig of the most recently loaded configuration
+_resolved = {}
+
+
+def _config_files(state):
+    src_path = state.conf.src_path
+    paths = {str(src_path)} if src_path.is_file() else set()
+    directory = src_path if src_path.is_dir() else src_path.parent
+    for name in CONFIG_FILES:
+        paths.add(os.path.join(str(directory), name))
+    return sorted(paths)
+
+
+def _read_file_info(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, []
+    key = path, st.st_mtime_ns, st.st_size
+    if key not in _file_info:
+        try:
+            with trace.span("configcache.read", "filesystem", path=path), open(
+                path, "rb"
+            ) as f:
+                content = f.read()
+        except OSError:
+            return None, []
+        text = content.decode("utf-8", errors="replace")
+        names = sorted({m for r in _ENV_REFERENCE_RES for m in r.findall(text)})
+        _file_info[key] = hashlib.sha256(content).hexdigest(), names
+    return _file_info[key]
+
+
+def cache_key(state, env_name):
+    """Everything the evaluated configuration of env_name may depend on"""
+    from tox import __version__ as TOX_VERSION
+
+    opt = state.conf.options
+    files = {}
+    environ = {name: value for name, value in os.environ.items() if name.startswith("TOX_")}
+    for path in _config_files(state):
+        digest, names = _read_file_info(path)
+        files[path] = digest
+        for name in names:
+            environ[name] = os.environ.get(name)
+    return {
+        "env": env_name,
+        "files": files,
+        "environ": environ,
+        "cwd": os.getcwd(),
+        "pos_args": state.conf.pos_args(None),
+        "overrides": [str(o) for o in getattr(opt, "override", None) or []],
+        "work_dir": str(getattr(opt, "work_dir", None)),
+        "root_dir": str(getattr(opt, "root_dir", None)),
+        "interpreters": bool(getattr(opt, "current_env_interpreters", False)),
+        "python": [sys.executable, list(sys.version_info)],
+        "tox": TOX_VERSION,
+        "plugin": cache.plugin_version(),
+    }
+
+
+def _filename(env_name):
+    return "resolved-" + re.sub(r"[^\w.-]", "_", env_name) + ".json"
+
+
+class ResolvedConfig:
+    """Evaluated configuration values of one tox environment,
+    loaded from and saved to the cache in the tox work dir"""
+
+    def __init__(self, work_dir, env_name, key):
+        self.path = cache.cache_path(work_dir, _filename(env_name))
+        self.key = key
+        self.values = cache.load(self.path, key) or {}
+        self._changed = False
+
+    def __contains__(self, name):
+        return name in self.values
+
+    def get(self, name, evaluate):
+        """Cached value of name, evaluate() is only called on a cache miss"""
+        if name not in self.values:
+            self.values[name] = evaluate()
+            self._changed = True
+        return self.values[name]
+
+    def save(self):
+        if self._changed:
+            cache.store(self.path, self.key, self.values)
+            self._changed = False
+
+
+def load(state, env_name):
+    """Load and remember the ResolvedConfig of env_name"""
+    work_dir = state.conf.core["work_dir"]
+    resolved = ResolvedConfig(work_dir, env_name, cache_key(state, env_name))
+    _resolved[str(work_dir), env_name] = resolved
+    return resolved
+
+
+def resolved(work_dir, env_name):
+    """The ResolvedConfig of env_name remembered by load() or None"""
+    return _resolved.get((str(work_dir), env_name))
@@ -0,0 +1,122 @@
+"""Which requirements does the current environment not satisfy?
+
+Used by --check-deps and --print-missing-deps-to. The index of the installed
+distributions is built once per interpreter from the installed module
+(so it is cached between invocations as well), the specifiers and markers
+are evaluated with packaging.
+
+Requirement files (-r) are read, other options, constraints (-c),
+editables (-e), paths and URLs are not checked."""
+
+import os
+import threading
+
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+from packaging.version import InvalidVersion, Version
+
+from tox_current_env import installed, trace
+
+# executable -> {canonical name: version}
+_indexes = {}
+_lock = threading.Lock()
+
+
+def index(work_dir=None, executable=None, path=None):
+    """The installed distributions' versions by their canonical names,
+    see installed.installed() for the arguments"""
+    key = executable
+    with _lock:
+        if key not in _indexes:
+            found = {}
+            for line in installed.installed(work_dir, executable, path):
+                name, _, version = line.partition("==")
+                found[canonicalize_name(name)] = version
+            _indexes[key] = found
+        return _indexes[key]
+
+
+def marker_environment(facts=None):
+    """The environment to evaluate markers in; for the current interpreter
+    or for another one, given its facts from the interpreter module"""
+    environment = default_environment()
+    # Requirements are not installed as extras of anything
+    environment["extra"] = ""
+    if facts is not None:
+        version_info = facts["version_info"]
+        environment["python_version"] = "{}.{}".format(*version_info[:2])
+        environment["python_full_version"] = "{}.{}.{}".format(*version_info[:3])
+        environment["platform_python_implementation"] = facts["implementation"]
+        environment["implementation_name"] = facts["implementation"].lower()
+    return environment
+
+
+def _strip_comment(line):
+    if line.startswith("#"):
+        return ""
+    return line.split(" #", 1)[0].strip()
+
+
+def _requirement_file(line):
+    """The file name of a -r/--requirement line, or None"""
+    for prefix in ("--requirement=", "--requirement ", "-r"):
+        if line.startswith(prefix):
+            return line[len(prefix):].strip()
+    return None
+
+
+def _expand(lines, root, seen=None):
+    """Requirement strings of lines, with requirement files read relative to root"""
+    seen = set() if seen is None else seen
+    for line in lines:
+        line = _strip_comment(line.strip())
+        if not line:
+            continue
+        if line.startswith("-"):
+            name = _requirement_file(line)
+            if name is None:
+                continue
+            path = os.path.normpath(os.path.join(str(root), name))
+            if path in seen:
+                continue
+            seen.add(path)
+            try:
+                with open(path, encoding="utf-8") as f:
+                    nested = f.read().replace("\\\n", "").splitlines()
+            except OSError:
+                continue
+            yield from _expand(nested, os.path.dirname(path), seen)
+            continue
+        yield line
+
+
+def _contains(specifier, version):
+    if not specifier:
+        return True
+    try:
+        return specifier.contains(Version(version), prereleases=True)
+    except InvalidVersion:
+        return False
+
+
+@trace.traced("depcheck.unsatisfied")
+def unsatisfied(lines, index, root, environment=None):
+    """The requirements in lines the distributions in index don't satisfy,
+    as they are written"""
+    if environment is None:
+        environment = marker_environment()
+    missing = []
+    for line in _expand(lines, root):
+        try:
+            requirement = Requirement(line)
+        except InvalidRequirement:
+            continue
+        if requirement.marker is not None and not requirement.marker.evaluate(
+            environment
+        ):
+            continue
+        version = index.get(canonicalize_name(requirement.name))
+        if version is None or not _contains(requirement.specifier, version):
+            missing.append(line)
+    return missing
@@ -0,0 +1,119 @@
+"""Requirements of the dependency groups (PEP 735), the [dependency-groups] table
+of pyproject.toml, with the include-group entries expanded.
+
+Used by --print-expanded-dependency-groups-to. The table is read once per project
+and each group is expanded once, however many environments and other groups
+include it. Group names are compared normalized, like package names."""
+
+import os
+import sys
+import threading
+
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from tox_current_env import trace
+
+# path of pyproject.toml -> DependencyGroups
+_projects = {}
+_lock = threading.Lock()
+
+
+class GroupError(ValueError):
+    """The dependency groups are invalid, include each other or are not defined"""
+
+
+def unique(requirements):
+    """requirements without duplicates (as normalized by packaging), in the original order"""
+    seen = set()
+    result = []
+    for requirement in requirements:
+        try:
+            key = str(Requirement(requirement))
+        except InvalidRequirement:
+            key = requirement
+        if key not in seen:
+            seen.add(key)
+            result.append(requirement)
+    return result
+
+
+class DependencyGroups:
+    """The [dependency-groups] table of one project"""
+
+    def __init__(self, table):
+        if not isinstance(table, dict):
+            raise GroupError(f"dependency-groups is {type(table).__name__} instead of table")
+        self._groups = {}
+        for name, entries in table.items():
+            normalized = canonicalize_name(name)
+            if normalized in self._groups:
+                raise GroupError(f"dependency group {name!r} is defined more than once")
+            self._groups[normalized] = entries
+        # normalized name -> requirements
+        self._expanded = {}
+        self._lock = threading.Lock()
+
+    def expand(self, names):
+        """Requirements of the groups called names, without duplicates"""
+        with self._lock:
+            requirements = []
+            for name in names:
+                requirements += self._expand(canonicalize_name(name), ())
+        return unique(requirements)
+
+    def _expand(self, name, including):
+        if name in self._expanded:
+            return self._expanded[name]
+        if name in including:
+            cycle = including[including.index(name):] + (name,)
+            raise GroupError(f"dependency groups include each other: {' -> '.join(cycle)}")
+        if name not in self._groups:
+            if including:
+                raise GroupError(
+                    f"dependency group {name!r} (included by {including[-1]!r}) not found"
+                )
+            raise GroupError(f"dependency group {name!r} not found")
+        entries = self._groups[name]
+        if not isinstance(entries, list):
+            raise GroupError(f"dependency group {name!r} is not a list")
+        requirements = []
+        for entry in entries:
+            if isinstance(entry, str):
+                try:
+                    Requirement(entry)
+                except InvalidRequirement as exc:
+                    raise GroupError(f"{entry!r} is not a valid requirement: {exc}") from None
+                requirements.append(entry)
+            elif isinstance(entry, dict) and list(entry) == ["include-group"]:
+                included = canonicalize_name(entry["include-group"])
+                requirements += self._expand(included, including + (name,))
+            else:
+                raise GroupError(f"invalid item of dependency group {name!r}: {entry!r}")
+        self._expanded[name] = unique(requirements)
+        return self._expanded[name]
+
+
+def _load_toml(path):
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        import tomli as tomllib
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+@trace.traced("depgroups.for_project", "filesystem")
+def for_project(project_dir):
+    """The dependency groups of the project in project_dir, loaded once"""
+    path = os.path.join(str(project_dir), "pyproject.toml")
+    with _lock:
+        if path not in _projects:
+            try:
+                table = _load_toml(path).get("dependency-groups", {})
+            except FileNotFoundError:
+                table = {}
+            except ValueError as exc:  # TOMLDecodeError
+                raise GroupError(f"cannot read {path}: {exc}") from None
+            _projects[path] = DependencyGroups(table)
+        return _projects[path]
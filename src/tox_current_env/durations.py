@@ -0,0 +1,42 @@
+"""How long the commands of each testenv took in the previous --current-env runs.
+
+The durations are stored in the tox work dir. Parallel runs start the testenvs
+that took the longest first, so a long testenv started last doesn't decide
+when the whole run ends."""
+
+import threading
+
+from tox_current_env import cache
+
+CACHE_NAME = "durations.json"
+# Changes when the stored format changes
+_KEY = {"format": 1}
+
+# Testenvs running in parallel threads record their durations at the same time
+_lock = threading.Lock()
+
+
+def load(work_dir):
+    """Return {testenv name: seconds} of the previous runs"""
+    durations = cache.load(cache.cache_path(work_dir, CACHE_NAME), _KEY)
+    return durations if isinstance(durations, dict) else {}
+
+
+def record(work_dir, env_name, seconds):
+    """Remember the duration of the latest successful run of env_name"""
+    with _lock:
+        durations = load(work_dir)
+        durations[env_name] = round(seconds, 3)
+        cache.store(cache.cache_path(work_dir, CACHE_NAME), _KEY, durations)
+
+
+def longest_first(env_names, durations):
+    """Order env_names by decreasing duration.
+    Testenvs without a known duration come first, in their original order."""
+    unknown = [name for name in env_names if name not in durations]
+    known = sorted(
+        (name for name in env_names if name in durations),
+        key=lambda name: durations[name],
+        reverse=True,
+    )
+    return unknown + known
@@ -0,0 +1,454 @@
+"""A fork server running Python commands of --current-env in a warm interpreter.
+
+The server (zygote) is a Python process that imports the preloaded modules once
+and then forks a child for every Python command. The child gets the standard streams,
+arguments, environment and working directory of the command, so it behaves
+like `python -m module`, `python -c code` or `python script` started from scratch,
+without paying the interpreter startup and imports again.
+
+The client talks to the zygote over a Unix socket, one connection per command:
+the standard streams are sent as file descriptors with a JSON request,
+the zygote answers with the pid of the child and later with its exit code.
+
+Everything the interpreter only reads when it starts (PYTHON* and locale
+environment variables) must be the same for the zygote and the command,
+so there is one zygote per distinct set of those.
+Commands that cannot be run this way are left to a regular subprocess, see python_argv().
+"""
+
+import array
+import atexit
+import json
+import os
+import select
+import selectors
+import shutil
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from tox_current_env import trace
+
+# Environment variables the interpreter only reads on startup
+STARTUP_ENV_VARS = ("LANG", "LC_ALL", "LC_CTYPE")
+
+_servers = {}
+_servers_lock = threading.Lock()
+
+
+def supported():
+    """Whether the fork server can work on this platform"""
+    return hasattr(os, "fork") and hasattr(socket, "AF_UNIX")
+
+
+def startup_env(env):
+    """The part of env that must be the same for the zygote and the command"""
+    return tuple(sorted(
+        (name, value) for name, value in env.items()
+        if name.startswith("PYTHON") or name in STARTUP_ENV_VARS
+    ))
+
+
+def python_argv(cmd):
+    """For a command running the current interpreter (as python -m module, python -c code
+    or python script), return the arguments after the interpreter, otherwise None.
+    Commands with any other interpreter options run in a regular subprocess."""
+    if len(cmd) < 2 or os.path.realpath(cmd[0]) != os.path.realpath(sys.executable):
+        return None
+    first = cmd[1]
+    if first in ("-m", "-c"):
+        return list(cmd[1:]) if len(cmd) > 2 else None
+    if first.startswith(("-m", "-c")) and len(first) > 2:
+        return [first[:2], first[2:], *cmd[2:]]
+    if first.startswith("-"):
+        return None
+    return list(cmd[1:])
+
+
+def get_server(modules, env, cwd):
+    """A running zygote for the given preloaded modules and environment,
+    started when needed"""
+    key = tuple(modules), startup_env(env)
+    with _servers_lock:
+        server = _servers.get(key)
+        if server is None or not server.alive():
+            server = _servers[key] = ForkServer(modules, env, cwd)
+    return server
+
+
+class ForkServer:
+    """The client side of a zygote"""
+
+    @trace.traced("forkserver.start", "subprocess")
+    def __init__(self, modules, env, cwd):
+        self._dir = tempfile.mkdtemp(prefix="tox-current-env-")
+        self.path = os.path.join(self._dir, "zygote.sock")
+        self._process = subprocess.Popen(
+            [
+                sys.executable,
+                "-c",
+                "from tox_current_env.forkserver import main; main()",
+                self.path,
+                *modules,
+            ],
+            stdin=subprocess.PIPE,
+            stdout=subprocess.PIPE,
+            env=env,
+            cwd=cwd,
+        )
+        ready = self._process.stdout.readline()
+        self._process.stdout.close()
+        if ready != b"ready\n":
+            self.close()
+            raise RuntimeError("tox_current_env: the fork server failed to start")
+
+    def alive(self):
+        return self._process.poll() is None
+
+    @trace.traced("forkserver.spawn", "subprocess")
+    def spawn(self, argv, executable, cwd, env, fds):
+        """Fork a child running argv with the given standard stream fds,
+        return the connection to wait for its exit code on and its pid"""
+        conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            conn.connect(self.path)
+            conn.sendmsg(
+                [b"\0"],
+                [(socket.SOL_SOCKET, socket.SCM_RIGHTS, array.array("i", fds))],
+            )
+            request = {"argv": argv, "executable": executable, "cwd": cwd, "env": env}
+            conn.sendall(json.dumps(request).encode() + b"\n")
+            # Byte by byte, the exit code is read later, possibly in another thread
+            line = b""
+            while not line.endswith(b"\n"):
+                byte = conn.recv(1)
+                if not byte:
+                    raise OSError("connection closed")
+                line += byte
+            pid = json.loads(line)["pid"]
+        except (OSError, ValueError, KeyError):
+            conn.close()
+            raise OSError("tox_current_env: the fork server didn't start the command")
+        return conn, pid
+
+    def close(self):
+        # The zygote exits when its stdin is closed
+        try:
+            self._process.stdin.close()
+            self._process.wait()
+        finally:
+            shutil.rmtree(self._dir, ignore_errors=True)
+
+
+def close_servers():
+    with _servers_lock:
+        for server in _servers.values():
+            server.close()
+        _servers.clear()
+
+
+atexit.register(close_servers)
+
+
+class ForkedProcess:
+    """A command run by the fork server, with the parts of the subprocess.Popen
+    interface tox uses"""
+
+    def __init__(self, server, argv, executable, stdin, stdout, stderr, cwd, env):
+        self.args = [executable, *argv]
+        self.returncode = None
+        self.stdin = self.stdout = self.stderr = None
+        self._lock = threading.Lock()
+        self._buffer = b""
+        child_fds, to_close = [], []
+        streams = (("stdin", stdin, "wb"), ("stdout", stdout, "rb"), ("stderr", stderr, "rb"))
+        for number, (name, stream, mode) in enumerate(streams):
+            if stream is None:
+                child_fds.append(number)
+            elif stream == subprocess.DEVNULL:
+                fd = os.open(os.devnull, os.O_RDWR)
+                child_fds.append(fd)
+                to_close.append(fd)
+            elif stream == subprocess.PIPE:
+                read_fd, write_fd = os.pipe()
+                ours, theirs = (write_fd, read_fd) if mode == "wb" else (read_fd, write_fd)
+                setattr(self, name, os.fdopen(ours, mode, 0))
+                child_fds.append(theirs)
+                to_close.append(theirs)
+            else:
+                child_fds.append(stream)
+        try:
+            self._conn, self.pid = server.spawn(argv, executable, cwd, env, child_fds)
+        except OSError:
+            for stream in self.stdin, self.stdout, self.stderr:
+                if stream is not None:
+                    stream.close()
+            raise
+        finally:
+            for fd in to_close:
+                os.close(fd)
+
+    def _receive(self, timeout):
+        # Not holding the lock while waiting, so other threads can poll or send signals
+        if self.returncode is not None:
+            return
+        try:
+            readable, _, _ = select.select([self._conn], [], [], timeout)
+        except (OSError, ValueError):
+            readable = True
+        if not readable:
+            return
+        with self._lock:
+            if self.returncode is not None:
+                return
+            try:
+                data = self._conn.recv(4096, socket.MSG_DONTWAIT)
+            except BlockingIOError:
+                return
+            except OSError:
+                data = b""
+            self._buffer += data
+            if data and not self._buffer.endswith(b"\n"):
+                return
+            # A lost connection means the zygote died with the child
+            message = json.loads(self._buffer) if self._buffer.endswith(b"\n") else {}
+            self.returncode = message.get("returncode", -signal.SIGKILL)
+
+    def poll(self):
+        self._receive(0)
+        return self.returncode
+
+    def wait(self, timeout=None):
+        end = None if timeout is None else time.monotonic() + timeout
+        while self.returncode is None:
+            remaining = None if end is None else end - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                raise subprocess.TimeoutExpired(self.args, timeout)
+            self._receive(remaining)
+        return self.returncode
+
+    def send_signal(self, sig):
+        if self.poll() is None:
+            try:
+                os.kill(self.pid, sig)
+            except ProcessLookupError:
+                pass
+
+    def terminate(self):
+        self.send_signal(signal.SIGTERM)
+
+    def kill(self):
+        self.send_signal(signal.SIGKILL)
+
+
+# The zygote
+
+
+def _receive_request(conn):
+    fds = array.array("i")
+    _, ancdata, _, _ = conn.recvmsg(1, socket.CMSG_SPACE(3 * fds.itemsize))
+    for level, kind, data in ancdata:
+        if level == socket.SOL_SOCKET and kind == socket.SCM_RIGHTS:
+            fds.frombytes(data[: len(data) - (len(data) % fds.itemsize)])
+    reader = conn.makefile("rb")
+    request = json.loads(reader.readline())
+    reader.close()
+    return request, list(fds)
+
+
+def _reopen_stdio():
+    # The same as the interpreter does on startup, for the new fds 0, 1 and 2
+    import io
+
+    unbuffered = bool(os.environ.get("PYTHONUNBUFFERED"))
+
+    def stream(fd, mode, like, **kwargs):
+        raw = io.FileIO(fd, mode, closefd=False)
+        buffered = (io.BufferedReader if mode == "rb" else io.BufferedWriter)(raw)
+        return io.TextIOWrapper(
+            buffered, encoding=like.encoding, errors=like.errors, write_through=unbuffered, **kwargs
+        )
+
+    sys.stdin = sys.__stdin__ = stream(0, "rb", sys.__stdin__)
+    sys.stdout = sys.__stdout__ = stream(1, "wb", sys.__stdout__, line_buffering=os.isatty(1))
+    sys.stderr = sys.__stderr__ = stream(2, "wb", sys.__stderr__, line_buffering=True)
+
+
+def _exit_code(code):
+    # How the interpreter handles SystemExit
+    if code is None:
+        return 0
+    if isinstance(code, int):
+        return code
+    print(code, file=sys.stderr)
+    return 1
+
+
+def _run_child(request, fds):
+    """Become the command, never returns"""
+    import runpy
+    import traceback
+    import types
+
+    for number, fd in enumerate(fds):
+        os.dup2(fd, number)
+    for fd in set(fds) - {0, 1, 2}:
+        os.close(fd)
+    os.chdir(request["cwd"])
+    os.environ.clear()
+    os.environ.update(request["env"])
+    _reopen_stdio()
+    sys.executable = request["executable"]
+
+    argv = request["argv"]
+    safe_path = getattr(sys.flags, "safe_path", False)
+    code = 0
+    try:
+        if argv[0] == "-m":
+            sys.argv = ["-m", *argv[2:]]
+            if not safe_path:
+                sys.path.insert(0, os.getcwd())
+            runpy.run_module(argv[1], run_name="__main__", alter_sys=True)
+        elif argv[0] == "-c":
+            sys.argv = ["-c", *argv[2:]]
+            if not safe_path:
+                sys.path.insert(0, "")
+            main = types.ModuleType("__main__")
+            main.__builtins__ = __builtins__
+            sys.modules["__main__"] = main
+            exec(compile(argv[1], "<string>", "exec"), main.__dict__)
+        else:
+            sys.argv = list(argv)
+            if not safe_path:
+                sys.path.insert(0, os.path.dirname(os.path.realpath(argv[0])))
+            runpy.run_path(argv[0], run_name="__main__")
+    except SystemExit as e:
+        code = _exit_code(e.code)
+    except KeyboardInterrupt:
+        traceback.print_exc()
+        code = -signal.SIGINT
+    except BaseException:
+        traceback.print_exc()
+        code = 1
+    finally:
+        # What the interpreter does on exit
+        shutdown = getattr(threading, "_shutdown", None)
+        if shutdown is not None:
+            shutdown()
+        import atexit
+
+        atexit._run_exitfuncs()
+        for stream in sys.stdout, sys.stderr:
+            try:
+                stream.flush()
+            except (OSError, ValueError):
+                pass
+        if code == -signal.SIGINT:
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            os.kill(os.getpid(), signal.SIGINT)
+        os._exit(code & 0xFF)
+
+
+def _reap(children):
+    while children:
+        try:
+            pid, status = os.waitpid(-1, os.WNOHANG)
+        except ChildProcessError:
+            return
+        if pid == 0:
+            return
+        if os.WIFSIGNALED(status):
+            returncode = -os.WTERMSIG(status)
+        else:
+            returncode = os.WEXITSTATUS(status)
+        conn = children.pop(pid, None)
+        if conn is not None:
+            try:
+                conn.sendall(json.dumps({"returncode": returncode}).encode() + b"\n")
+            except OSError:
+                pass
+            conn.close()
+
+
+def main():
+    """The zygote: python -c '...' SOCKET_PATH [MODULE...]"""
+    import importlib
+
+    path, modules = sys.argv[1], sys.argv[2:]
+    if sys.path and sys.path[0] == "":
+        # Each command gets its own sys.path[0]
+        del sys.path[0]
+    for module in modules:
+        try:
+            importlib.import_module(module)
+        except Exception as e:
+            print(f"tox_current_env: cannot preload {module}: {e}", file=sys.stderr)
+
+    listener = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    listener.bind(path)
+    listener.listen(16)
+    wakeup_read, wakeup_write = os.pipe()
+    os.set_blocking(wakeup_read, False)
+    os.set_blocking(wakeup_write, False)
+    signal.set_wakeup_fd(wakeup_write)
+    signal.signal(signal.SIGCHLD, lambda signum, frame: None)
+    # Interrupts go to the commands, tox stops us by closing stdin
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    selector = selectors.DefaultSelector()
+    selector.register(listener, selectors.EVENT_READ)
+    selector.register(wakeup_read, selectors.EVENT_READ)
+    selector.register(sys.stdin.buffer, selectors.EVENT_READ)
+    sys.stdout.write("ready\n")
+    sys.stdout.flush()
+    devnull = os.open(os.devnull, os.O_WRONLY)
+    os.dup2(devnull, 1)
+    os.close(devnull)
+
+    children = {}
+    while True:
+        for key, _ in selector.select():
+            if key.fileobj is listener:
+                conn, _ = listener.accept()
+                try:
+                    request, fds = _receive_request(conn)
+                except (OSError, ValueError):
+                    conn.close()
+                    continue
+                pid = os.fork()
+                if pid == 0:
+                    selector.close()
+                    listener.close()
+                    conn.close()
+                    for other in children.values():
+                        other.close()
+                    signal.set_wakeup_fd(-1)
+                    os.close(wakeup_read)
+                    os.close(wakeup_write)
+                    signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                    signal.signal(signal.SIGINT, signal.default_int_handler)
+                    _run_child(request, fds)
+                for fd in fds:
+                    os.close(fd)
+                try:
+                    conn.sendall(json.dumps({"pid": pid}).encode() + b"\n")
+                except OSError:
+                    pass
+                children[pid] = conn
+            elif key.fileobj == wakeup_read:
+                try:
+                    os.read(wakeup_read, 512)
+                except BlockingIOError:
+                    pass
+                _reap(children)
+            elif not os.read(sys.stdin.fileno(), 512):
+                listener.close()
+                try:
+                    os.unlink(path)
+                    os.rmdir(os.path.dirname(path))
+                except OSError:
+                    pass
+                return
@@ -1,15 +1,13 @@
 import os
-import shutil
+import platform
+import re
 import subprocess
 import sys
 import tox
 import warnings
 import argparse
 
-try:
-    import importlib.metadata as importlib_metadata
-except ImportError:
-    import importlib_metadata
+from tox.interpreters import py_spec, via_path
 
 
 @tox.hookimpl
@@ -21,6 +19,14 @@ def tox_addoption(parser):
         default=False,
         help="Run tests in current environment, not creating any virtual environment",
     )
+    parser.add_argument(
+        "--current-env-matching-only",
+        action="store_true",
+        dest="current_env_matching_only",
+        default=False,
+        help="With --current-env, only run the environments whose Python version "
+            + "(basepython or the py factor) matches the current interpreter",
+    )
     parser.add_argument(
         "--print-deps-only",
         action="store_true",
@@ -88,6 +94,11 @@ def tox_configure(config):
             )
     if _plugin_active(config.option):
         config.skipsdist = True
+        _remember_python_info(sys.executable)
+        _remove_stale_fake_envs(config)
+        from tox_current_env import trash
+
+        trash.reap(config.toxworkdir)
         for testenv in config.envconfigs:
             config.envconfigs[testenv].usedevelop = False
             _allow_all_externals(config.envconfigs[testenv])
@@ -97,6 +108,19 @@ def tox_configure(config):
             # Unfortunately at this point the set contains actual values, not globs:
             config.envconfigs[testenv].passenv |= set(os.environ.keys())
 
+    if config.option.current_env and config.option.current_env_matching_only:
+        matching = [
+            envname
+            for envname in config.envlist
+            if _basepython_matches_current(config.envconfigs[envname].basepython)
+        ]
+        if not matching:
+            raise tox.exception.ConfigError(
+                f"No environment matches the current Python {sys.version_info[0]}.{sys.version_info[1]}, "
+                + f"the selected ones are: {', '.join(config.envlist)}"
+            )
+        config.envlist = matching
+
     # When printing dependencies/extras we don't run any commands.
     # Unfortunately tox_runtest_pre/tox_runtest_post hooks don't use firstresult=True,
     # so we cannot override running commands_pre/commands_post.
@@ -119,6 +143,52 @@ class InterpreterMismatch(tox.exception.InterpreterNotFound):
     """Interpreter version in current env does not match requested version"""
 
 
+# python3.11, py311 or py3.11, but not python3, pypy3.9 or a path
+_PYTHON_SPEC_RE = re.compile(r"^(?:python|py)([2-9])\.?([0-9]+)$")
+
+
+def _spec_matches_current(basepython):
+    """Does the basepython spec name the current interpreter's major.minor?
+    Decided without running the requested interpreter,
+    False when the spec doesn't match or is ambiguous."""
+    if basepython is None:
+        return False
+    if basepython == sys.executable:
+        return True
+    match = _PYTHON_SPEC_RE.match(basepython)
+    if match is None:
+        return False
+    return (int(match.group(1)), int(match.group(2))) == sys.version_info[:2]
+
+
+def _basepython_matches_current(basepython):
+    """Can the basepython spec be the current interpreter?
+    Paths and other specs tox cannot parse are not ruled out."""
+    spec = py_spec.PythonSpec.from_name(basepython)
+    return spec.name is None or py_spec.CURRENT.satisfies(spec)
+
+
+def _remember_python_info(executable):
+    """tox runs a helper script to learn about an interpreter (and remembers the answer).
+    For the current interpreter, or our symbolic link to it, we answer in-process."""
+    executable = str(executable)
+    via_path._python_info_cache.setdefault(
+        executable,
+        {
+            "executable": executable,
+            "implementation": platform.python_implementation(),
+            "version_info": list(sys.version_info),
+            "version": sys.version,
+            "is_64": sys.maxsize > 2**32,
+            "sysplatform": sys.platform,
+            "os_sep": os.sep,
+            "extra_version_info": (
+                list(sys.pypy_version_info) if hasattr(sys, "pypy_version_info") else None
+            ),
+        },
+    )
+
+
 def _python_activate_exists(venv):
     python = venv.envconfig.get_envpython()
     bindir = os.path.dirname(python)
@@ -126,41 +196,86 @@ def _python_activate_exists(venv):
     return os.path.exists(python), os.path.exists(activate)
 
 
-def is_current_env_link(venv):
-    python, activate = _python_activate_exists(venv)
-    return python and not activate
+# Environments without a manifest, created by older versions of this plugin
+# or by a --current-env run that didn't finish
+UNKNOWN_FAKE = "unknown-fake"
+
 
+def env_mode(venv):
+    """How was the environment created? See the manifest module.
+    None if there is no environment."""
+    from tox_current_env import manifest
 
-def is_proper_venv(venv):
+    found = manifest.read(venv.envconfig.envdir)
+    if found is not None:
+        return found.get("mode")
     python, activate = _python_activate_exists(venv)
-    return python and activate
+    if python and activate:
+        return manifest.REGULAR
+    if python:
+        return UNKNOWN_FAKE
+    return None
 
 
-def is_any_env(venv):
-    python, activate = _python_activate_exists(venv)
-    return python
+def _write_manifest(venv, mode, executable):
+    from tox_current_env import manifest
+
+    manifest.write(venv.envconfig.envdir, manifest.expected(mode, executable))
+
+
+def is_reusable_fake_env(venv):
+    """Is there a fake virtualenv of this plugin version for the current interpreter?"""
+    from tox_current_env import manifest
+
+    found = manifest.read(venv.envconfig.envdir)
+    return (
+        found is not None
+        and found.get("mode") in manifest.FAKE
+        and found == manifest.expected(found["mode"], sys.executable)
+    )
+
+
+def _remove_stale_fake_envs(config):
+    """tox reuses an environment without asking us when its own configuration matches,
+    so fake virtualenvs for another interpreter or plugin version are removed upfront.
+    tox then asks the python of a reused one about itself, we answer that in-process."""
+    from tox_current_env import manifest, trash
+
+    for envname in config.envlist:
+        envdir = config.envconfigs[envname].envdir
+        found = manifest.read(envdir)
+        if found is None or found.get("mode") not in manifest.FAKE:
+            continue
+        if found != manifest.expected(found["mode"], sys.executable):
+            manifest.forget(envdir)
+            trash.discard(envdir, config.toxworkdir)
+        else:
+            _remember_python_info(config.envconfigs[envname].get_envpython())
 
 
 def rm_venv(venv):
+    from tox_current_env import manifest, trash
+
+    manifest.forget(venv.envconfig.envdir)
     link = venv.envconfig.get_envpython()
-    shutil.rmtree(os.path.dirname(os.path.dirname(link)), ignore_errors=True)
+    trash.discard(os.path.dirname(os.path.dirname(link)), venv.envconfig.config.toxworkdir)
 
 
 def unsupported_raise(config, venv):
+    from tox_current_env import manifest
+
     if config.option.recreate:
         return
-    if not _plugin_active(config.option) and is_current_env_link(venv):
-        if hasattr(tox.hookspecs, "tox_cleanup"):
-            raise tox.exception.ConfigError(
-                "Looks like previous --current-env, --print-deps-to or --print-extras-to tox run didn't finish the cleanup. "
-                "Run tox run with --recreate (-r) or manually remove the environment in .tox."
-            )
-        else:
-            raise tox.exception.ConfigError(
-                "Regular tox run after --current-env, --print-deps-to or --print-extras-to tox run "
-                "is not supported without --recreate (-r)."
-            )
-    elif config.option.current_env and is_proper_venv(venv):
+    mode = env_mode(venv)
+    if not _plugin_active(config.option) and mode in manifest.FAKE:
+        # The fake virtualenv of a previous run, tox creates a real one instead
+        rm_venv(venv)
+    elif not _plugin_active(config.option) and mode == UNKNOWN_FAKE:
+        raise tox.exception.ConfigError(
+            "Looks like previous --current-env, --print-deps-to or --print-extras-to tox run didn't finish the cleanup. "
+            "Run tox run with --recreate (-r) or manually remove the environment in .tox."
+        )
+    elif config.option.current_env and mode == manifest.REGULAR:
         raise tox.exception.ConfigError(
             "--current-env after regular tox run is not supported without --recreate (-r)."
         )
@@ -169,10 +284,13 @@ def unsupported_raise(config, venv):
 @tox.hookimpl
 def tox_testenv_create(venv, action):
     """We create a fake virtualenv with just the symbolic link"""
+    from tox_current_env import manifest
+
     config = venv.envconfig.config
     create_fake_env = check_version = config.option.current_env
+    mode = manifest.CURRENT_ENV
     if config.option.print_deps_to or config.option.print_extras_to:
-        if is_any_env(venv):
+        if env_mode(venv) is not None:
             # We don't need anything
             return True
         else:
@@ -181,8 +299,11 @@ def tox_testenv_create(venv, action):
             # We fallback to --current-env behavior,
             # because it's cheaper, faster and won't install stuff
             create_fake_env = True
-    if check_version:
+            mode = manifest.PRINT
+    if check_version and not _spec_matches_current(venv.envconfig.basepython):
         # With real --current-env, we check this, but not with --print-deps/extras-to only
+        # Getting python_info runs the requested interpreter,
+        # only do that when the spec alone doesn't say it matches
         version_info = venv.envconfig.python_info.version_info
         if version_info is None:
             raise tox.exception.InterpreterNotFound(venv.envconfig.basepython)
@@ -192,6 +313,10 @@ def tox_testenv_create(venv, action):
                 + f"    in current env: {tuple(sys.version_info)}\n"
                 + f"    requested: {version_info}"
             )
+    if create_fake_env and not config.option.recreate and is_reusable_fake_env(venv):
+        # Kept from a previous run
+        _remember_python_info(venv.envconfig.get_envpython())
+        return True
     if create_fake_env:
         # Make sure the `python` command on path is sys.executable.
         # (We might have e.g. /usr/bin/python3, not `python`.)
@@ -205,10 +330,22 @@ def tox_testenv_create(venv, action):
             subprocess.check_call(f'mklink /J "{link}" "{target}"', shell=True)
         else:
             os.symlink(target, link)
+        # tox asks the env's python about itself after creating the env
+        _remember_python_info(link)
+        _write_manifest(venv, mode, target)
         # prevent tox from creating the venv
         return True
-    if not is_proper_venv(venv):
+    if env_mode(venv) != manifest.REGULAR:
         rm_venv(venv)
+    else:
+        # tox is about to create it again, don't make it wait for the removal.
+        # The manifest is written again after it's created.
+        from tox_current_env import trash
+
+        manifest.forget(venv.envconfig.envdir)
+        trash.discard_contents(
+            venv.envconfig.envdir, config.toxworkdir, keep=(".lock", "log")
+        )
     return None  # let tox handle the rest
 
 
@@ -226,6 +363,11 @@ def tox_testenv_install_deps(venv, action):
     unsupported_raise(config, venv)
     if _plugin_active(config.option):
         return True
+    from tox_current_env import manifest
+
+    # tox has just created the environment
+    if manifest.read(venv.envconfig.envdir) is None:
+        _write_manifest(venv, manifest.REGULAR, venv.envconfig.python_info.executable)
 
 
 def tox_dependencies(config):
@@ -266,25 +408,13 @@ def tox_runtest(venv, redirect):
     return ret
 
 
-@tox.hookimpl
-def tox_cleanup(session):
-    """Remove the fake virtualenv not to collide with regular tox
-    Collisions can happen anyway (when tox is killed forcefully before this happens)
-    Note that we don't remove real venvs, as recreating them is expensive"""
-    for venv in session.venv_dict.values():
-        if is_current_env_link(venv):
-            rm_venv(venv)
-
-
 @tox.hookimpl
 def tox_runenvreport(venv, action):
     """Prevent using pip to display installed packages,
     use importlib.metadata instead, but fallback to default without our flags."""
-    if not _plugin_active(venv.envconfig.config.option):
+    config = venv.envconfig.config
+    if not _plugin_active(config.option):
         return None
-    return (
-        "{}=={}".format(d.metadata.get("name"), d.version)
-        for d in sorted(
-            importlib_metadata.distributions(), key=lambda d: d.metadata.get("name")
-        )
-    )
+    from tox_current_env import installed
+
+    return installed.installed(config.toxworkdir)
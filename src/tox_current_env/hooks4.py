@@ -1,30 +1,61 @@
+"""tox 4 hooks of this plugin.
+
+This module is imported by every tox run, so it only defines the options.
+Everything else is in runner4, imported when an option of the plugin is used."""
+
 import argparse
-import os
-import platform
-import sys
-import sysconfig
-from pathlib import Path
-from typing import Set
-
-from tox.config.loader.memory import MemoryLoader
-from tox.execute.local_sub_process import (
-    Execute,
-    LocalSubProcessExecuteInstance,
-)
+
 from tox.plugin import impl
-from tox.tox_env.python.api import PythonInfo, PythonSpec
-from tox.tox_env.python.runner import PythonRun
 
-try:
-    import importlib.metadata as importlib_metadata
-except ImportError:
-    import importlib_metadata
+PRINT_OPTIONS = (
+    "print_deps_to",
+    "print_extras_to",
+    "print_expanded_extras_to",
+    "print_dependency_groups_to",
+    "print_expanded_dependency_groups_to",
+    "print_manifest_to",
+    "print_missing_deps_to",
+)
+
+def printing(opt):
+    return any(getattr(opt, o) for o in PRINT_OPTIONS)
+
+
+def activated(opt):
+    """Is any option of the plugin used?"""
+    return bool(
+        opt.current_env
+        or printing(opt)
+        or getattr(opt, "current_env_trace", None)
+    )
+
+
+class _Runner:
+    """Stands in for a runner of runner4 in the tox environment register.
+    The runner ids must be known when the options are parsed (--runner),
+    runner4 is only imported when an environment of the runner is created."""
+
+    def __init__(self, runner_id, class_name):
+        self._id = runner_id
+        self._class_name = class_name
+
+    def id(self):
+        return self._id
+
+    def __call__(self, create_args):
+        from tox_current_env import runner4
+
+        return getattr(runner4, self._class_name)(create_args)
+
+
+# runner id -> class name in runner4
+RUNNER_IDS = {"current-env": "CurrentEnv", "print-env": "PrintEnv"}
 
 
 @impl
 def tox_register_tox_env(register):
-    register.add_run_env(CurrentEnv)
-    register.add_run_env(PrintEnv)
+    for runner_id, class_name in RUNNER_IDS.items():
+        register.add_run_env(_Runner(runner_id, class_name))
 
 
 @impl
@@ -36,6 +67,61 @@ def tox_add_option(parser):
         default=False,
         help="Run tests in current environment, not creating any virtual environment",
     )
+    parser.add_argument(
+        "--current-env-fork-server",
+        nargs="?",
+        const="",
+        default=None,
+        of_type=str,
+        metavar="MODULES",
+        help="With --current-env, run Python commands in processes forked from a warm "
+        + "interpreter, which has the given comma separated modules imported",
+    )
+    parser.add_argument(
+        "--current-env-cache",
+        action="store_true",
+        default=False,
+        help="With --current-env, don't run the commands of environments that passed before "
+        + "with the same sources, commands and installed distributions",
+    )
+    parser.add_argument(
+        "--current-env-matching-only",
+        action="store_true",
+        default=False,
+        help="With --current-env, only run the environments whose Python version "
+        + "(base_python or the py factor) matches the current interpreter",
+    )
+    parser.add_argument(
+        "--current-env-interpreters",
+        action="store_true",
+        default=False,
+        help="With --current-env, run each environment with the interpreter on PATH "
+        + "matching its base_python (such as python3.12 for py312) and its installed "
+        + "packages, instead of the current interpreter",
+    )
+    parser.add_argument(
+        "--check-deps",
+        action="store_true",
+        default=False,
+        help="With --current-env, fail an environment before running its commands "
+        + "when the installed packages don't satisfy its dependencies or the tox requires",
+    )
+    parser.add_argument(
+        "--current-env-trace",
+        default=None,
+        of_type=str,
+        metavar="FILE",
+        help="Write the durations of the plugin's hooks, commands and file operations "
+        + "to the given file, in the Chrome trace format",
+    )
+    parser.add_argument(
+        "--current-env-metrics",
+        default=None,
+        of_type=str,
+        metavar="FILE",
+        help="With --current-env, write the command durations, setup times, number of commands "
+        + "and exit codes of the environments to the given file, in the Prometheus text format",
+    )
     parser.add_argument(
         "--print-deps-to",
         "--print-deps-to-file",
@@ -56,6 +142,17 @@ def tox_add_option(parser):
         help="Don't run tests, only print the  names of the required extras to the given file "
         + "(use `-` for stdout)",
     )
+    parser.add_argument(
+        "--print-expanded-extras-to",
+        "--print-expanded-extras-to-file",
+        action="store",
+        type=argparse.FileType("w"),
+        metavar="FILE",
+        default=False,
+        help="Don't run tests, only print the requirements of the required extras "
+        + "of the project, for the current Python and without duplicates, to the given file "
+        + "(use `-` for stdout)",
+    )
     parser.add_argument(
         "--print-dependency-groups-to",
         "--print-dependency-groups-to-file",
@@ -66,6 +163,37 @@ def tox_add_option(parser):
         help="Don't run tests, only print the names of the required dependency-groups to the given file "
         + "(use `-` for stdout)",
     )
+    parser.add_argument(
+        "--print-expanded-dependency-groups-to",
+        "--print-expanded-dependency-groups-to-file",
+        action="store",
+        type=argparse.FileType("w"),
+        metavar="FILE",
+        default=False,
+        help="Don't run tests, only print the requirements of the required dependency-groups, "
+        + "with included groups expanded and without duplicates, to the given file "
+        + "(use `-` for stdout)",
+    )
+    parser.add_argument(
+        "--print-manifest-to",
+        "--print-manifest-to-file",
+        action="store",
+        type=argparse.FileType("w"),
+        metavar="FILE",
+        default=False,
+        help="Don't run tests, only print the requires, dependencies, extras and dependency-groups "
+        + "of each environment as one JSON line to the given file (use `-` for stdout)",
+    )
+    parser.add_argument(
+        "--print-missing-deps-to",
+        "--print-missing-deps-to-file",
+        action="store",
+        type=argparse.FileType("w"),
+        metavar="FILE",
+        default=False,
+        help="Don't run tests, only print the dependencies (and tox requires) that "
+        + "the installed packages don't satisfy to the given file (use `-` for stdout)",
+    )
     parser.add_argument(
         "--assert-config",
         action="store_true",
@@ -86,215 +214,49 @@ def tox_add_core_config(core_conf, state):
             "See https://tox.wiki/en/latest/config.html for details."
         )
 
-    if opt.current_env or opt.print_deps_to or opt.print_extras_to or opt.print_dependency_groups_to:
-        # We do not want to install the main package.
-        # no_package is the same as skipsdist.
-        loader = MemoryLoader(no_package=True)
-        core_conf.loaders.insert(0, loader)
+    if activated(opt):
+        from tox_current_env import runner4
 
-    if opt.current_env:
-        opt.default_runner = "current-env"
-        return
+        runner4.add_core_config(core_conf, state)
 
-    exclusive = [getattr(getattr(opt, o), "name", object())
-                 for o in ("print_deps_to", "print_extras_to", "print_dependency_groups_to")]
-    if len(exclusive) != len(set(exclusive)):
-        raise RuntimeError(
-            "The paths given to --print-*-to options cannot be identical."
-        )
 
-    if opt.print_deps_to or opt.print_extras_to or opt.print_dependency_groups_to:
-        opt.default_runner = "print-env"
-        return
+@impl
+def tox_add_env_config(env_conf, state):
+    if activated(state.conf.options):
+        from tox_current_env import runner4
+
+        runner4.add_env_config(env_conf, state)
 
 
 @impl
-def tox_add_env_config(env_conf, state):
-    opt = state.conf.options
-    # This allows all external commands.
-    # All of them are external for us.
-    # Because tox 4 no longer reads $TOX_TESTENV_PASSENV,
-    # this plugin always passes all environment variables by default.
-    if opt.current_env:
-        allow_external_cmds = MemoryLoader(allowlist_externals=["*"], pass_env=["*"])
-        env_conf.loaders.insert(0, allow_external_cmds)
-    # For print-*-to, use empty list of commands so that tox does nothing.
-    if opt.print_deps_to or opt.print_extras_to or opt.print_dependency_groups_to:
-        empty_commands = MemoryLoader(commands=[], commands_pre=[], commands_post=[])
-        env_conf.loaders.insert(0, empty_commands)
-
-
-class Installer:
-    """Noop installer"""
-
-    def install(self, *args, **kwargs):
-        return None
-
-    def installed(self):
-        """Return list of installed packages like `pip freeze`."""
-        return [
-            "{}=={}".format(d.metadata.get("name"), d.version)
-            for d in sorted(
-                importlib_metadata.distributions(), key=lambda d: d.metadata.get("name")
-            )
-        ]
-
-
-class CurrentEnvLocalSubProcessExecutor(Execute):
-    def build_instance(
-        self,
-        request,
-        options,
-        out,
-        err,
-    ):
-        request.env["PATH"] = ":".join(
-            (str(options._env.env_dir / "bin"), request.env.get("PATH", ""))
-        )
-        return LocalSubProcessExecuteInstance(request, options, out, err)
-
-
-class CurrentEnv(PythonRun):
-    def __init__(self, create_args):
-        self._executor = None
-        self._installer = None
-        self._path = []
-        super().__init__(create_args)
-
-    @staticmethod
-    def id():
-        return "current-env"
-
-    @property
-    def _default_package_tox_env_type(self):
-        return None
-
-    @property
-    def _external_pkg_tox_env_type(self):
-        return None
-
-    @property
-    def _package_tox_env_type(self):
-        return None
-
-    @property
-    def executor(self):
-        if self._executor is None:
-            self._executor = CurrentEnvLocalSubProcessExecutor(self.options.is_colored)
-        return self._executor
-
-    def _get_python(self, base_python):
-        return PythonInfo(
-            implementation=sys.implementation,
-            version_info=sys.version_info,
-            version=sys.version,
-            is_64=(platform.architecture()[0] == "64bit"),
-            platform=platform.platform(),
-            extra={"executable": Path(sys.executable)},
+def tox_before_run_commands(tox_env):
+    if activated(tox_env.options):
+        from tox_current_env import runner4
+
+        runner4.before_run_commands(tox_env)
+    else:
+        _record_regular_env(tox_env)
+
+
+def _record_regular_env(tox_env):
+    """tox keeps track of its own environments,
+    the manifest tells a later --current-env run this one is a regular one"""
+    from tox.tox_env.python.api import Python
+
+    if not isinstance(tox_env, Python) or tox_env.id() in RUNNER_IDS:
+        return
+    from tox_current_env import manifest
+
+    if manifest.read(tox_env.env_dir) is None:
+        executable = tox_env.base_python.extra["executable"]
+        manifest.write(
+            tox_env.env_dir, manifest.expected(manifest.REGULAR, executable)
         )
 
-    def create_python_env(self):
-        """Fake Python environment just to make sure all possible
-        commands like python or python3 works."""
-        bindir = self.env_dir / "bin"
-        if not bindir.exists():
-            os.mkdir(bindir)
-        for suffix in (
-            "",
-            f"{sys.version_info.major}",
-            f"{sys.version_info.major}.{sys.version_info.minor}",
-        ):
-            symlink = bindir / f"python{suffix}"
-            if not symlink.exists():
-                os.symlink(sys.executable, symlink)
-
-    def env_bin_dir(self):
-        return Path(sysconfig.get_path("scripts"))
-
-    def env_python(self):
-        return sys.executable
-
-    def env_site_package_dir(self):
-        return Path(sysconfig.get_path("purelib"))
-
-    @property
-    def installer(self):
-        return Installer()
-
-    def prepend_env_var_path(self):
-        return [self.env_bin_dir()]
-
-    @property
-    def runs_on_platform(self):
-        return sys.platform
-
-    @classmethod
-    def python_spec_for_path(cls, path):
-        # Needed for https://github.com/fedora-python/tox-current-env/issues/77
-        # This is a copy of an internal tox method added in
-        #   https://github.com/tox-dev/tox/pull/3327
-        implementation = sys.implementation.name
-        version = sys.version_info
-        bits = "64" if sys.maxsize > 2**32 else "32"
-        string_spec = f"{implementation}{version.major}{version.minor}-{bits}"
-        return PythonSpec.from_string_spec(string_spec)
-
-
-class PrintEnv(CurrentEnv):
-    def __init__(self, create_args):
-        super().__init__(create_args)
-
-        if self.options.print_extras_to:
-            if "extras" not in self.conf:
-                # Unfortunately, if there is skipsdist/no_package or skip_install
-                # in the config, this section is not parsed at all so we have to
-                # do it here manually to be able to read its content.
-                self.conf.add_config(
-                    keys=["extras"],
-                    of_type=Set[str],
-                    default=set(),
-                    desc="extras to install of the target package",
-                )
-
-    def create_python_env(self):
-        """We don't need any environment for this plugin"""
-        return None
-
-    def prepend_env_var_path(self):
-        """Usage of this method for the core of this plugin is far from perfect
-        but this method is called every time even without recreated environment"""
-        if self.options.print_deps_to:
-            print(
-                *self.core["requires"],
-                *self.conf["deps"].lines(),
-                sep="\n",
-                file=self.options.print_deps_to,
-            )
-            self.options.print_deps_to.flush()
-
-        if self.options.print_extras_to:
-            print(
-                *self.conf["extras"],
-                sep="\n",
-                file=self.options.print_extras_to,
-            )
-            self.options.print_extras_to.flush()
-
-        if self.options.print_dependency_groups_to:
-            if "dependency_groups" not in self.conf:
-                raise RuntimeError(
-                    "tox is too old to know about dependency_groups."
-                )
-            print(
-                *self.conf["dependency_groups"],
-                sep="\n",
-                file=self.options.print_dependency_groups_to,
-            )
-            self.options.print_dependency_groups_to.flush()
-
-        # https://github.com/fedora-python/tox-current-env/issues/75
-        return super().prepend_env_var_path()
-
-    @staticmethod
-    def id():
-        return "print-env"
+
+@impl
+def tox_after_run_commands(tox_env, exit_code, outcomes):
+    if activated(tox_env.options):
+        from tox_current_env import runner4
+
+        runner4.after_run_commands(tox_env, exit_code, outcomes)
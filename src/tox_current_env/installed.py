@@ -0,0 +1,174 @@
+"""The list of packages installed in the current environment, like `pip freeze`.
+
+The list is computed once per tox invocation and shared by all testenvs.
+It is also stored in the tox work dir, keyed by the interpreter
+and by the modification times of the directories on sys.path,
+so an unchanged environment is not scanned again in the next invocation.
+Other interpreters (see --current-env-interpreters) are scanned
+the same way, given their executable and sys.path.
+
+Names and versions are read from the names of the *.dist-info and *.egg-info
+directories, the metadata files are only opened when that is ambiguous.
+Newer installers normalize the name in the directory name,
+the report uses the Name from the metadata, like pip freeze."""
+
+import hashlib
+import heapq
+import os
+import re
+import sys
+
+from tox_current_env import cache, trace
+
+CACHE_NAME = "installed.json"
+
+# {name}-{version}.dist-info, see
+# https://packaging.python.org/en/latest/specifications/recording-installed-packages/
+_DIST_DIR_RE = re.compile(r"^(?P<name>[^-]+)-(?P<version>[0-9][^-]*)\.(?:dist|egg)-info$")
+# The name can only be used directly when it contains no separators,
+# otherwise we don't know if the original was "-", "_" or ".",
+# and when it isn't lowercase, otherwise it may have been normalized
+_PLAIN_NAME_RE = re.compile(r"^[A-Za-z0-9]+$")
+
+# executable -> list of installed packages
+_installed = {}
+
+
+def _fingerprint(executable, path):
+    """Installing, removing or upgrading a distribution
+    changes the modification time of the directory it lives in"""
+    paths = []
+    for entry in path:
+        try:
+            paths.append([entry, os.stat(entry or os.curdir).st_mtime_ns])
+        except OSError:
+            continue
+    return {"executable": executable, "paths": paths}
+
+
+@trace.traced("installed.distributions_fingerprint", "filesystem")
+def distributions_fingerprint(executable=None, path=None):
+    """Names and modification times of the *.dist-info and *.egg-info
+    directories on sys.path, cheap to compute and changed by any
+    installation, removal or upgrade"""
+    if executable is None:
+        executable, path = sys.executable, sys.path
+    found = [executable]
+    for entry in path:
+        directory = entry or os.curdir
+        try:
+            entries = sorted(os.listdir(directory))
+        except OSError:
+            continue
+        for name in entries:
+            if name.endswith((".dist-info", ".egg-info")):
+                try:
+                    mtime = os.stat(os.path.join(directory, name)).st_mtime_ns
+                except OSError:
+                    continue
+                found.append(f"{entry}/{name}:{mtime}")
+    return hashlib.sha256("\n".join(found).encode("utf-8", "surrogateescape")).hexdigest()
+
+
+def _canonical(name):
+    return re.sub(r"[-_.]+", "-", name).lower()
+
+
+def _read_headers(path):
+    """Read the Name and Version headers from a METADATA/PKG-INFO file,
+    stop at the end of the headers"""
+    headers = {}
+    try:
+        with open(path, encoding="utf-8", errors="replace") as f:
+            for line in f:
+                if not line.strip():
+                    break
+                key, sep, value = line.partition(":")
+                if sep and key in ("Name", "Version"):
+                    headers.setdefault(key, value.strip())
+    except OSError:
+        pass
+    return headers.get("Name"), headers.get("Version")
+
+
+def _metadata_file(path):
+    if path.endswith(".dist-info"):
+        return os.path.join(path, "METADATA")
+    if os.path.isdir(path):
+        return os.path.join(path, "PKG-INFO")
+    return path  # legacy single-file .egg-info
+
+
+def _name_version(directory, entry):
+    match = _DIST_DIR_RE.match(entry)
+    if match and _PLAIN_NAME_RE.match(match["name"]) and not match["name"].islower():
+        return match["name"], match["version"]
+    name, version = _read_headers(_metadata_file(os.path.join(directory, entry)))
+    if match:
+        name = name or match["name"]
+        version = version or match["version"]
+    if not name or not version:
+        return None
+    return name, version
+
+
+def _iter_directory(directory):
+    """Distributions in one sys.path directory, sorted by name"""
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return
+    found = []
+    for entry in entries:
+        if entry.endswith((".dist-info", ".egg-info")):
+            name_version = _name_version(directory, entry)
+            if name_version is not None:
+                found.append(name_version)
+    found.sort(key=lambda nv: nv[0].lower())
+    yield from found
+
+
+def iter_installed(path=None):
+    """Generate the installed packages like `pip freeze`, sorted by name.
+    When a distribution is installed multiple times, the first one on sys.path wins."""
+    seen = set()
+    if path is None:
+        path = sys.path
+    directories = [_iter_directory(entry or os.curdir) for entry in path]
+    for name, version in heapq.merge(*directories, key=lambda nv: nv[0].lower()):
+        canonical = _canonical(name)
+        if canonical not in seen:
+            seen.add(canonical)
+            yield f"{name}=={version}"
+
+
+@trace.traced("installed.scan", "filesystem")
+def _scan(path):
+    return list(iter_installed(path))
+
+
+def _cache_name(executable):
+    if executable == sys.executable:
+        return CACHE_NAME
+    digest = hashlib.sha256(executable.encode("utf-8", "surrogateescape")).hexdigest()
+    return f"installed-{digest[:16]}.json"
+
+
+def installed(work_dir=None, executable=None, path=None):
+    """Return list of installed packages like `pip freeze`.
+    When work_dir is given, the result is cached on disk in it.
+    Without executable and path (its sys.path), for the current interpreter."""
+    if executable is None:
+        executable, path = sys.executable, sys.path
+    if executable not in _installed:
+        if work_dir is None:
+            found = _scan(path)
+        else:
+            cache_file = cache.cache_path(work_dir, _cache_name(executable))
+            key = _fingerprint(executable, path)
+            found = cache.load(cache_file, key)
+            if found is None:
+                found = _scan(path)
+                cache.store(cache_file, key, found)
+        _installed[executable] = found
+    return _installed[executable]
@@ -0,0 +1,120 @@
+"""Facts about the interpreters the testenvs run with that are slow to look up.
+
+platform.architecture() may run the `file` command on the executable and
+platform.platform() and sysconfig read files and configuration. The facts
+are looked up once per tox invocation and shared by all testenvs. They are
+also stored in the tox work dir, keyed by the executable, its modification
+time and the prefix, so they are not looked up again in the next invocation.
+
+Other interpreters than the current one (see --current-env-interpreters)
+are looked up by running the source of the introspect module with them."""
+
+import hashlib
+import json
+import os
+import subprocess
+import sys
+import threading
+
+from tox_current_env import cache, introspect, trace
+
+CACHE_NAME = "interpreter.json"
+
+_facts = None
+# executable -> facts or None when it cannot be run
+_other_facts = {}
+_lock = threading.Lock()
+
+# Not run as a script, that would put the package directory of this plugin
+# (with modules such as trace) first on sys.path. With -c, the current
+# directory is first, it is removed before anything is imported.
+_PREAMBLE = 'import sys\nif sys.path[:1] == [""]:\n    del sys.path[0]\n'
+
+
+def _fingerprint():
+    try:
+        mtime = os.stat(sys.executable).st_mtime_ns
+    except OSError:
+        mtime = None
+    return {
+        "executable": sys.executable,
+        "mtime": mtime,
+        "prefix": sys.prefix,
+        "version": list(sys.version_info),
+    }
+
+
+def _look_up():
+    return introspect.look_up()
+
+
+def _introspect_source():
+    with open(introspect.__file__, encoding="utf-8") as f:
+        return f.read()
+
+
+@trace.traced("interpreter.query", "subprocess")
+def _query(executable):
+    try:
+        out = subprocess.run(
+            [executable, "-c", _PREAMBLE + _introspect_source()],
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+            encoding="utf-8",
+        ).stdout
+        return json.loads(out)
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+
+def _unchanged(found):
+    """Is the interpreter the facts were looked up from still the same?"""
+    try:
+        return os.stat(found["executable"]).st_mtime_ns == found["mtime"]
+    except (OSError, KeyError, TypeError):
+        return False
+
+
+def _other(executable, work_dir):
+    if work_dir is None:
+        return _query(executable)
+    digest = hashlib.sha256(executable.encode("utf-8", "surrogateescape")).hexdigest()
+    path = cache.cache_path(work_dir, f"interpreter-{digest[:16]}.json")
+    key = {"executable": executable}
+    found = cache.load(path, key)
+    if found is None or not _unchanged(found):
+        found = _query(executable)
+        if found is not None:
+            cache.store(path, key, found)
+    return found
+
+
+def facts(work_dir=None, executable=None):
+    """Return a dict with is_64, platform, and the scripts and purelib paths.
+    When work_dir is given, the result is cached on disk in it.
+
+    For an executable other than the current one, the dict also has
+    the executable the command runs (not a symlink or a shim),
+    its mtime, implementation, version_info, version and sys.path as path.
+    None when it cannot be run."""
+    global _facts
+    if executable is not None and executable != sys.executable:
+        with _lock:
+            if executable not in _other_facts:
+                found = _other_facts[executable] = _other(executable, work_dir)
+                if found is not None:
+                    # executable may be a symlink or a shim of the interpreter
+                    _other_facts.setdefault(found["executable"], found)
+            return _other_facts[executable]
+    if _facts is None:
+        if work_dir is None:
+            _facts = _look_up()
+        else:
+            path = cache.cache_path(work_dir, CACHE_NAME)
+            key = _fingerprint()
+            _facts = cache.load(path, key)
+            if _facts is None:
+                _facts = _look_up()
+                cache.store(path, key, _facts)
+    return _facts
@@ -0,0 +1,39 @@
+"""Facts about an interpreter, looked up by running the source of this module with it.
+
+Only uses the standard library and runs on any Python 3,
+because the interpreter doesn't have this plugin installed.
+Prints the facts as JSON, see interpreter.facts().
+It's run with -c and with the current directory removed from sys.path,
+see interpreter._query(), so it imports nothing but the standard library."""
+
+import json
+import os
+import platform
+import sys
+import sysconfig
+
+
+def look_up():
+    return {
+        "is_64": platform.architecture()[0] == "64bit",
+        "platform": platform.platform(),
+        "scripts": sysconfig.get_path("scripts"),
+        "purelib": sysconfig.get_path("purelib"),
+    }
+
+
+def main():
+    facts = look_up()
+    facts.update(
+        executable=sys.executable,
+        mtime=os.stat(sys.executable).st_mtime_ns,
+        implementation=platform.python_implementation(),
+        version_info=list(sys.version_info),
+        version=sys.version,
+        path=sys.path,
+    )
+    print(json.dumps(facts))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,69 @@
+"""The manifest in every environment directory this plugin deals with.
+
+It records which mode created the directory (current-env, print or regular),
+the interpreter and the plugin version, so the kind of an environment
+doesn't have to be guessed from the files in it. It is read at most once
+per environment directory and tox invocation and kept in memory."""
+
+import json
+import os
+import threading
+
+from tox_current_env import cache
+
+FILENAME = ".tox-current-env.json"
+
+CURRENT_ENV = "current-env"
+PRINT = "print"
+REGULAR = "regular"
+# The fake environments with just the symbolic link to the interpreter
+FAKE = (CURRENT_ENV, PRINT)
+
+_NOT_READ = object()
+# str(env_dir) -> manifest dict or None when there is none
+_manifests = {}
+_lock = threading.Lock()
+
+
+def expected(mode, executable):
+    """The manifest of an environment created now in mode for executable"""
+    return {"mode": mode, "executable": str(executable), "plugin": cache.plugin_version()}
+
+
+def _path(env_dir):
+    return os.path.join(str(env_dir), FILENAME)
+
+
+def read(env_dir):
+    """The manifest of env_dir or None"""
+    with _lock:
+        found = _manifests.get(str(env_dir), _NOT_READ)
+        if found is _NOT_READ:
+            try:
+                with open(_path(env_dir), encoding="utf-8") as f:
+                    found = json.load(f)
+            except (OSError, ValueError):
+                found = None
+            if not isinstance(found, dict):
+                found = None
+            _manifests[str(env_dir)] = found
+        return found
+
+
+def write(env_dir, manifest):
+    """Atomically write the manifest of env_dir,
+    other tox processes may set up the same environment at the same time"""
+    path = _path(env_dir)
+    tmp = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+    os.replace(tmp, path)
+    with _lock:
+        _manifests[str(env_dir)] = manifest
+
+
+def forget(env_dir):
+    """env_dir was removed (or is about to be)"""
+    with _lock:
+        _manifests[str(env_dir)] = None
+
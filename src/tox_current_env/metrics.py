@@ -0,0 +1,150 @@
+"""Per testenv metrics of --current-env runs, see --current-env-metrics.
+
+The metrics are written when tox exits, in the Prometheus text format,
+to be collected by the textfile collector of the node exporter.
+The file is replaced atomically, so the collector never reads half of it."""
+
+import atexit
+import os
+import sys
+import threading
+import time
+
+PREFIX = "tox_current_env"
+
+# Upper bounds of the command duration histogram buckets, in seconds
+BUCKETS = (0.1, 0.5, 1, 5, 10, 30, 60, 300, 900, 3600)
+
+_path = None
+_lock = threading.Lock()
+# env name -> {"commands": [(seconds, exit code)], "setup": seconds, "exit_code": int, ...}
+_envs = {}
+
+
+def start(path):
+    """Start collecting, the metrics are written to path when the process exits"""
+    global _path
+    if _path is None:
+        atexit.register(write)
+    _path = path
+
+
+def _env(name):
+    return _envs.setdefault(name, {"commands": []})
+
+
+def observe_command(env_name, seconds, exit_code):
+    if _path is not None:
+        with _lock:
+            _env(env_name)["commands"].append((seconds, exit_code))
+
+
+def observe_setup(env_name, seconds):
+    if _path is not None:
+        with _lock:
+            _env(env_name)["setup"] = seconds
+
+
+def observe_result(env_name, exit_code):
+    if _path is not None:
+        with _lock:
+            _env(env_name)["exit_code"] = exit_code
+
+
+def _escape(value):
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(**labels):
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in labels.items()) + "}"
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def render():
+    """The collected metrics in the Prometheus text format"""
+    lines = []
+
+    def metric(name, kind, description, samples):
+        if not samples:
+            return
+        lines.append(f"# HELP {PREFIX}_{name} {description}")
+        lines.append(f"# TYPE {PREFIX}_{name} {kind}")
+        for suffix, labels, value in samples:
+            lines.append(f"{PREFIX}_{name}{suffix}{labels} {_number(value)}")
+
+    with _lock:
+        envs = sorted(_envs.items())
+
+    histogram = []
+    for env, data in envs:
+        durations = [seconds for seconds, _ in data["commands"]]
+        for bound in BUCKETS:
+            count = sum(1 for seconds in durations if seconds <= bound)
+            histogram.append(("_bucket", _labels(env=env, le=bound), count))
+        histogram.append(("_bucket", _labels(env=env, le="+Inf"), len(durations)))
+        histogram.append(("_sum", _labels(env=env), float(sum(durations))))
+        histogram.append(("_count", _labels(env=env), len(durations)))
+    metric(
+        "command_duration_seconds",
+        "histogram",
+        "Wall time of the commands run in the testenv.",
+        histogram,
+    )
+    metric(
+        "commands",
+        "gauge",
+        "Number of commands run in the testenv in the last run.",
+        [("", _labels(env=env), len(data["commands"])) for env, data in envs],
+    )
+    metric(
+        "command_failures",
+        "gauge",
+        "Number of commands run in the testenv in the last run that exited with a non-zero code.",
+        [
+            ("", _labels(env=env), sum(1 for _, code in data["commands"] if code))
+            for env, data in envs
+        ],
+    )
+    metric(
+        "setup_duration_seconds",
+        "gauge",
+        "Wall time of setting up the testenv.",
+        [("", _labels(env=env), data["setup"]) for env, data in envs if "setup" in data],
+    )
+    metric(
+        "exit_code",
+        "gauge",
+        "Exit code of the commands of the testenv, 0 when they passed.",
+        [
+            ("", _labels(env=env), data["exit_code"])
+            for env, data in envs
+            if "exit_code" in data
+        ],
+    )
+    metric(
+        "last_run_timestamp_seconds",
+        "gauge",
+        "When the metrics were written, in seconds since the epoch.",
+        [("", "", time.time())],
+    )
+    return "\n".join(lines) + "\n"
+
+
+def write():
+    """Atomically write the collected metrics to the metrics file"""
+    if _path is None:
+        return
+    tmp = f"{_path}.{os.getpid()}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(render())
+        os.replace(tmp, _path)
+    except OSError as exception:
+        print(f"tox-current-env: cannot write the metrics: {exception}", file=sys.stderr)
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
@@ -0,0 +1,172 @@
+"""Requirements of the extras of the project, without installing it.
+
+Used by --print-expanded-extras-to. When the [project] table of pyproject.toml
+has static optional-dependencies, they are read directly. Otherwise the build
+backend is asked for the metadata (prepare_metadata_for_build_wheel, or building
+the wheel when the backend doesn't have that hook) with the current interpreter,
+and its Requires-Dist is cached in the tox work dir, keyed by the digest
+of the source tree (see runcache.source_digest).
+
+Markers are evaluated for the current interpreter and the requirements
+are returned without them. Extras of the project itself (project[other])
+are expanded."""
+
+import os
+import sys
+import tempfile
+import threading
+from email.parser import HeaderParser
+from pathlib import Path
+
+from packaging.markers import default_environment
+from packaging.requirements import InvalidRequirement, Requirement
+from packaging.utils import canonicalize_name
+
+from tox_current_env import cache, depgroups, runcache, trace
+
+CACHE_NAME = "extras-metadata.json"
+
+# project directory -> ProjectExtras
+_projects = {}
+_lock = threading.Lock()
+
+
+class ExtrasError(ValueError):
+    """The requirements of the extras cannot be found out"""
+
+
+class ProjectExtras:
+    """The optional dependencies of one project"""
+
+    def __init__(self, name, requirements):
+        """requirements are lists of requirement strings by (normalized) extra names"""
+        self.name = canonicalize_name(name)
+        self._requirements = requirements
+
+    def expand(self, extras):
+        """Requirements of extras for the current interpreter, without duplicates.
+        Extras the project doesn't have are ignored, as pip does."""
+        environment = default_environment()
+        pending = [canonicalize_name(extra) for extra in extras]
+        seen = set()
+        requirements = []
+        while pending:
+            extra = pending.pop(0)
+            if extra in seen:
+                continue
+            seen.add(extra)
+            for line in self._requirements.get(extra, []):
+                try:
+                    requirement = Requirement(line)
+                except InvalidRequirement as exc:
+                    raise ExtrasError(f"{line!r} is not a valid requirement: {exc}") from None
+                if requirement.marker is not None and not requirement.marker.evaluate(
+                    dict(environment, extra=extra)
+                ):
+                    continue
+                if canonicalize_name(requirement.name) == self.name:
+                    pending += [canonicalize_name(e) for e in sorted(requirement.extras)]
+                    continue
+                requirement.marker = None
+                requirements.append(str(requirement))
+        return depgroups.unique(requirements)
+
+
+def _load_pyproject(project_dir):
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        import tomli as tomllib
+    path = os.path.join(str(project_dir), "pyproject.toml")
+    try:
+        with open(path, "rb") as f:
+            return tomllib.load(f)
+    except FileNotFoundError:
+        return {}
+    except ValueError as exc:  # TOMLDecodeError
+        raise ExtrasError(f"cannot read {path}: {exc}") from None
+
+
+def _static(project_dir):
+    """ProjectExtras from [project] in pyproject.toml, None if they are dynamic"""
+    project = _load_pyproject(project_dir).get("project")
+    if not isinstance(project, dict) or "name" not in project:
+        return None
+    if "optional-dependencies" in project.get("dynamic", []):
+        return None
+    table = project.get("optional-dependencies", {})
+    return ProjectExtras(
+        project["name"], {canonicalize_name(k): list(v) for k, v in table.items()}
+    )
+
+
+@trace.traced("optdeps.build_metadata", "subprocess")
+def _build_metadata(project_dir):
+    """Name, Requires-Dist and Provides-Extra from the build backend"""
+    from pyproject_api import BackendFailed, SubprocessFrontend
+
+    try:
+        args = SubprocessFrontend.create_args_from_folder(Path(project_dir))
+        frontend = SubprocessFrontend(*args[:-1])
+        with tempfile.TemporaryDirectory() as tmp:
+            result = frontend.prepare_metadata_for_build_wheel(Path(tmp))
+            if result is not None:
+                metadata_dir = result.metadata
+            else:
+                metadata_dir = frontend.metadata_from_built(Path(tmp), "wheel")[0]
+            with open(metadata_dir / "METADATA", encoding="utf-8") as f:
+                metadata = HeaderParser().parse(f)
+    except BackendFailed as exc:
+        raise ExtrasError(f"the build backend failed to prepare the metadata: {exc}") from None
+    return {
+        "name": metadata["Name"],
+        "requires_dist": metadata.get_all("Requires-Dist") or [],
+        "provides_extra": metadata.get_all("Provides-Extra") or [],
+    }
+
+
+def _dynamic(project_dir, work_dir):
+    """ProjectExtras from the metadata the build backend prepares"""
+    if work_dir is None:
+        found = _build_metadata(project_dir)
+    else:
+        path = cache.cache_path(work_dir, CACHE_NAME)
+        key = {
+            "project": os.path.abspath(str(project_dir)),
+            "executable": sys.executable,
+            "plugin": cache.plugin_version(),
+        }
+        found = cache.load(path, dict(key, sources=runcache.source_digest(project_dir, work_dir)))
+        if found is None:
+            found = _build_metadata(project_dir)
+            # The backend may write to the source tree (such as *.egg-info)
+            key["sources"] = runcache.source_digest(project_dir, work_dir)
+            cache.store(path, key, found)
+
+    requirements = {}
+    for extra in found["provides_extra"]:
+        extra = canonicalize_name(extra)
+        requirements[extra] = []
+        for line in found["requires_dist"]:
+            marker = Requirement(line).marker
+            # Only the requirements the extra adds, not the ones always required
+            if (
+                marker is not None
+                and marker.evaluate({"extra": extra})
+                and not marker.evaluate({"extra": ""})
+            ):
+                requirements[extra].append(line)
+    return ProjectExtras(found["name"], requirements)
+
+
+def for_project(project_dir, work_dir=None):
+    """The extras of the project in project_dir, loaded once.
+    When work_dir is given, the metadata from the build backend is cached in it."""
+    key = os.path.abspath(str(project_dir))
+    with _lock:
+        if key not in _projects:
+            found = _static(project_dir)
+            if found is None:
+                found = _dynamic(project_dir, work_dir)
+            _projects[key] = found
+        return _projects[key]
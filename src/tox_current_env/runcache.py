@@ -0,0 +1,141 @@
+"""Remember which testenvs passed with --current-env-cache, so unchanged ones aren't run again.
+
+A run is identified by a key (the testenv's evaluated commands and settings,
+the interpreter and the installed distributions, see runner4) and by a digest
+of the content of the source tree. Both the digest before and after a passing
+run are remembered, so files the run writes (such as coverage data) don't
+invalidate it."""
+
+import hashlib
+import os
+import re
+import stat
+import subprocess
+import threading
+
+from tox_current_env import cache, trace
+
+# Directories with VCS data, caches, virtual environments and build output,
+# never part of the sources
+EXCLUDED_DIRS = {
+    ".git",
+    ".hg",
+    ".svn",
+    ".tox",
+    ".nox",
+    ".eggs",
+    ".venv",
+    "venv",
+    "env",
+    "build",
+    "dist",
+    "node_modules",
+    "__pycache__",
+    ".pytest_cache",
+    ".mypy_cache",
+    ".ruff_cache",
+    ".hypothesis",
+}
+
+SOURCES_CACHE_NAME = "sources.json"
+
+# Testenvs running in parallel threads hash the sources at the same time
+_lock = threading.Lock()
+
+
+def _filename(env_name):
+    return "passed-" + re.sub(r"[^\w.-]", "_", env_name) + ".json"
+
+
+def _excluded(dirname):
+    return dirname in EXCLUDED_DIRS or dirname.endswith(".egg-info")
+
+
+def _git_files(root, *options):
+    """Files git ls-files lists with the given options, relative to root.
+    None when root is not in a git checkout."""
+    try:
+        out = subprocess.run(
+            ["git", "ls-files", "-z"] + list(options),
+            cwd=str(root),
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            check=True,
+        ).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    return {os.fsdecode(name) for name in out.split(b"\0") if name}
+
+
+def _iter_files(root, work_dir):
+    work_dir = os.path.abspath(str(work_dir))
+    tracked = _git_files(root, "--cached")
+    if tracked is not None:
+        # Tracked files are sources wherever they are, such as in a build package.
+        # Untracked ones not ignored by git may still be a virtualenv without a .gitignore.
+        untracked = _git_files(root, "--others", "--exclude-standard") or set()
+        for relative in sorted(tracked | untracked):
+            filename = os.path.abspath(os.path.join(str(root), relative))
+            if filename.startswith(work_dir + os.sep):
+                continue
+            if relative not in tracked and any(map(_excluded, relative.split("/")[:-1])):
+                continue
+            yield filename
+        return
+    for dirpath, dirnames, filenames in os.walk(str(root)):
+        dirnames[:] = sorted(
+            d
+            for d in dirnames
+            if not _excluded(d) and os.path.join(dirpath, d) != work_dir
+        )
+        for filename in sorted(filenames):
+            yield os.path.join(dirpath, filename)
+
+
+def _sha256(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@trace.traced("runcache.source_digest", "filesystem")
+def source_digest(root, work_dir):
+    """Digest of the names and content of all files in the source tree.
+    In a git checkout, these are the tracked files and the untracked ones git doesn't ignore.
+    Files are only read again when their size or modification time changed."""
+    path = cache.cache_path(work_dir, SOURCES_CACHE_NAME)
+    key = os.path.abspath(str(root))
+    with _lock:
+        known = cache.load(path, key) or {}
+        hashed = {}
+        digest = hashlib.sha256()
+        for filename in _iter_files(root, work_dir):
+            relative = os.path.relpath(filename, str(root))
+            try:
+                st = os.stat(filename)
+                if not stat.S_ISREG(st.st_mode):
+                    continue
+                signature = [st.st_mtime_ns, st.st_size]
+                entry = known.get(relative)
+                if entry is None or entry[:2] != signature:
+                    entry = signature + [_sha256(filename)]
+            except OSError:
+                continue  # removed meanwhile or a broken symlink
+            hashed[relative] = entry
+            digest.update(f"{relative}\0{entry[2]}\0".encode("utf-8", "surrogateescape"))
+        if hashed != known:
+            cache.store(path, key, hashed)
+    return digest.hexdigest()
+
+
+def passed(work_dir, env_name, key, sources):
+    """Did env_name pass with the given key and source digest before?"""
+    digests = cache.load(cache.cache_path(work_dir, _filename(env_name)), key)
+    return bool(digests) and sources in digests
+
+
+def record(work_dir, env_name, key, sources):
+    """Remember that env_name passed with the given key and source digests"""
+    cache.store(cache.cache_path(work_dir, _filename(env_name)), key, sorted(set(sources)))
@@ -0,0 +1,892 @@
+"""The tox 4 runners of this plugin and the work its hooks do when it is activated.
+
+Imported by hooks4 only when an option of the plugin is used,
+so regular tox runs don't pay for importing it."""
+
+import json
+import logging
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import List, Set
+
+from tox.config.loader.api import ConfigLoadArgs
+from tox.config.loader.memory import MemoryLoader
+from tox.config.of_type import ConfigDynamicDefinition
+from tox.config.types import Command
+from tox.execute.api import ExecuteStatus, Outcome
+from tox.execute.local_sub_process import (
+    Execute,
+    LocalSubprocessExecuteFailedStatus,
+    LocalSubprocessExecuteStatus,
+    LocalSubProcessExecuteInstance,
+    ReadViaThread,
+)
+from tox.execute.request import StdinSource
+from tox.report import HandledError
+from tox.session.env_select import CliEnv
+from tox.tox_env.errors import Fail
+from tox.tox_env.python.api import PythonInfo, PythonSpec, VersionInfo
+from tox.tox_env.python.runner import PythonRun
+
+from tox_current_env import (
+    configcache,
+    depcheck,
+    depgroups,
+    durations,
+    forkserver,
+    installed,
+    interpreter,
+    manifest,
+    metrics,
+    optdeps,
+    runcache,
+    trace,
+    trash,
+)
+from tox_current_env.api import EnvResult
+from tox_current_env.hooks4 import PRINT_OPTIONS, printing
+
+COMMAND_KEYS = ("commands_pre", "commands", "commands_post")
+
+# Set to a per-environment directory when environments run in parallel
+TMPDIR_ENV_VARS = ("TMPDIR", "TEMP", "TMP")
+CACHE_DIR_ENV_VARS = ("XDG_CACHE_HOME",)
+
+# Set to the environment's share of the CPUs when environments run in parallel,
+# unless already set
+CPU_BUDGET_ENV_VARS = (
+    "PYTEST_XDIST_AUTO_NUM_WORKERS",
+    "OMP_NUM_THREADS",
+    "OPENBLAS_NUM_THREADS",
+    "MKL_NUM_THREADS",
+    "NUMEXPR_NUM_THREADS",
+)
+
+
+def _cpu_count():
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def _runs_parallel(opt):
+    if opt.command == "legacy":
+        # only 0 means sequential
+        return opt.parallel != 0 or opt.parallel_no_spinner
+    return opt.command in ("run-parallel", "p")
+
+
+def _parallel_jobs(state):
+    """How many tox environments run at the same time"""
+    opt = state.conf.options
+    if not _runs_parallel(opt):
+        return 1
+    parallel = opt.parallel
+    envs = len(list(state.envs.iter()))
+    if parallel == 0:
+        parallel = _cpu_count()
+    return max(1, min(parallel or envs, envs))
+
+
+@trace.traced("tox_add_core_config")
+def add_core_config(core_conf, state):
+    opt = state.conf.options
+    if opt.current_env_trace:
+        trace.start(opt.current_env_trace)
+    if opt.current_env_metrics and opt.current_env:
+        metrics.start(opt.current_env_metrics)
+
+    if opt.current_env or printing(opt):
+        # We do not want to install the main package.
+        # no_package is the same as skipsdist.
+        loader = MemoryLoader(no_package=True)
+        core_conf.loaders.insert(0, loader)
+
+    if opt.current_env:
+        opt.default_runner = "current-env"
+        core_conf.add_constant(
+            keys=["current_env_parallel_jobs"],
+            desc="number of tox environments run at the same time",
+            value=lambda: _parallel_jobs(state),
+        )
+        if opt.current_env_matching_only:
+            _select_matching(core_conf, state)
+        if _runs_parallel(opt):
+            _schedule_longest_first(core_conf, opt)
+        return
+
+    exclusive = [getattr(getattr(opt, o), "name", object()) for o in PRINT_OPTIONS]
+    if len(exclusive) != len(set(exclusive)):
+        raise RuntimeError(
+            "The paths given to --print-*-to options cannot be identical."
+        )
+
+    if printing(opt):
+        opt.default_runner = "print-env"
+        return
+
+
+def _schedule_longest_first(core_conf, opt):
+    """Select the environments explicitly, ordered by their previous durations"""
+    if getattr(opt, "labels", None) or getattr(opt, "factors", None):
+        return
+    env = getattr(opt, "env", None)
+    if env is not None and env.is_all:
+        return
+    history = durations.load(core_conf["work_dir"])
+    if not history:
+        return
+    names = list(core_conf["env_list"] if env is None or env.is_default_list else env)
+    ordered = durations.longest_first(names, history)
+    if ordered != names:
+        opt.env = CliEnv(ordered)
+
+
+def _base_pythons(state, name):
+    """The base_python of the environment, loaded without creating it"""
+    env_conf = state.conf.get_env(name)
+    definition = ConfigDynamicDefinition(
+        keys=["base_python", "basepython"],
+        desc="environment identifier for python",
+        of_type=List[str],
+        default=lambda conf, env_name: [
+            CurrentEnv.extract_base_python(env_name) or sys.executable
+        ],
+    )
+    args = ConfigLoadArgs(None, env_conf.name, env_conf.env_name)
+    return definition(state.conf, env_conf.loaders, args)
+
+
+def _matches_current(base_pythons):
+    """Does any of the base_python specs match the current interpreter?
+    A path is considered to be the current interpreter, as in CurrentEnv."""
+    current = CurrentEnv.python_spec_for_path(sys.executable)
+    for base_python in base_pythons:
+        spec = PythonSpec.from_string_spec(base_python)
+        if spec.path is not None:
+            spec = CurrentEnv.python_spec_for_path(Path(spec.path))
+        if all(
+            getattr(spec, key) in (None, getattr(current, key))
+            for key in ("implementation", "major", "minor", "architecture")
+        ) and spec.micro in (None, sys.version_info.micro):
+            return True
+    return False
+
+
+def _find_interpreter(base_pythons):
+    """The executable of the first base_python that is found:
+    the current interpreter when it matches,
+    a path, or pythonX.Y (pypyX.Y for PyPy) found on PATH"""
+    for base_python in base_pythons:
+        spec = PythonSpec.from_string_spec(base_python)
+        if spec.path is not None:
+            found = shutil.which(spec.path)
+            if found is not None:
+                return os.path.abspath(found)
+            continue
+        if _matches_current([base_python]):
+            return sys.executable
+        name = "pypy" if spec.implementation == "pypy" else "python"
+        if spec.major is not None:
+            name += str(spec.major)
+            if spec.minor is not None:
+                name += f".{spec.minor}"
+        found = shutil.which(name)
+        if found is not None:
+            return found
+    return None
+
+
+@trace.traced("select_matching")
+def _select_matching(core_conf, state):
+    """Select the environments whose base_python matches the current interpreter"""
+    opt = state.conf.options
+    if getattr(opt, "labels", None) or getattr(opt, "factors", None):
+        return
+    env = getattr(opt, "env", None)
+    if env is None or env.is_default_list:
+        names = list(core_conf["env_list"])
+    elif env.is_all:
+        names = list(state.conf)
+    else:
+        names = list(env)
+    matching = []
+    for name in names:
+        try:
+            base_pythons = _base_pythons(state, name)
+        except ValueError:
+            # conflicting factors, let tox report it
+            base_pythons = [sys.executable]
+        if _matches_current(base_pythons):
+            matching.append(name)
+    if not matching:
+        raise HandledError(
+            f"no environment matches the current Python {sys.version_info.major}."
+            + f"{sys.version_info.minor}, the selected ones are: {', '.join(names)}"
+        )
+    opt.env = CliEnv(matching)
+
+
+@trace.traced("tox_add_env_config")
+def add_env_config(env_conf, state):
+    opt = state.conf.options
+    # This allows all external commands.
+    # All of them are external for us.
+    # Because tox 4 no longer reads $TOX_TESTENV_PASSENV,
+    # this plugin always passes all environment variables by default.
+    if opt.current_env:
+        allow_external_cmds = MemoryLoader(allowlist_externals=["*"], pass_env=["*"])
+        env_conf.loaders.insert(0, allow_external_cmds)
+    # For print-*-to, use empty list of commands so that tox does nothing.
+    if printing(opt):
+        empty_commands = MemoryLoader(commands=[], commands_pre=[], commands_post=[])
+        env_conf.loaders.insert(0, empty_commands)
+    if (opt.current_env or printing(opt)) and getattr(opt, "work_dir_cache", True):
+        resolved = configcache.load(state, env_conf.name)
+        # Commands evaluated by a previous run with the same configuration.
+        # Not with other interpreters, {envpython} depends on what is found on $PATH.
+        if (
+            opt.current_env
+            and not getattr(opt, "current_env_interpreters", False)
+            and all(key in resolved for key in COMMAND_KEYS)
+        ):
+            cached_commands = MemoryLoader(
+                **{
+                    key: [Command(args) for args in resolved.values[key]]
+                    for key in COMMAND_KEYS
+                }
+            )
+            env_conf.loaders.insert(0, cached_commands)
+
+
+def _command_args(command):
+    """Arguments to recreate the command with Command(args)"""
+    if command.ignore_exit_code:
+        return ["-", *command.args]
+    if command.invert_exit_code:
+        return ["!", *command.args]
+    return list(command.args)
+
+
+@trace.traced("tox_before_run_commands")
+def before_run_commands(tox_env):
+    if not isinstance(tox_env, CurrentEnv) or isinstance(tox_env, PrintEnv):
+        return
+    tox_env._commands_started = time.monotonic()
+    resolved = configcache.resolved(tox_env.core["work_dir"], tox_env.name)
+    if resolved is not None and not tox_env._other_interpreters():
+        for key in COMMAND_KEYS:
+            resolved.get(key, lambda: [_command_args(c) for c in tox_env.conf[key]])
+        resolved.save()
+    if tox_env.options.current_env_cache:
+        _check_run_cache(tox_env)
+
+
+def _run_cache_key(tox_env):
+    """Everything but the sources the result of the commands depends on"""
+    set_env = tox_env.conf["set_env"]
+    return {
+        "env": tox_env.name,
+        "commands": {
+            key: [_command_args(c) for c in tox_env.conf[key]] for key in COMMAND_KEYS
+        },
+        "change_dir": str(tox_env.conf["change_dir"]),
+        "ignore_errors": tox_env.conf["ignore_errors"],
+        # PYTHONHASHSEED is random in every run unless --hashseed is given
+        "set_env": {k: set_env.load(k) for k in set_env if k != "PYTHONHASHSEED"},
+        "python": [tox_env.env_python(), list(tox_env.base_python.version_info)],
+        "distributions": _distributions_fingerprint(tox_env),
+    }
+
+
+def _distributions_fingerprint(tox_env):
+    if tox_env.env_python() == sys.executable:
+        return installed.distributions_fingerprint()
+    return installed.distributions_fingerprint(
+        tox_env.env_python(), tox_env._interpreter()["path"]
+    )
+
+
+def _check_run_cache(tox_env):
+    work_dir = tox_env.core["work_dir"]
+    key = _run_cache_key(tox_env)
+    sources = runcache.source_digest(tox_env.core["tox_root"], work_dir)
+    if runcache.passed(work_dir, tox_env.name, key, sources):
+        # The executor doesn't run the commands, see CachedExecuteInstance
+        tox_env._run_cached = True
+    else:
+        tox_env._run_cache = key, sources
+
+
+@trace.traced("tox_after_run_commands")
+def after_run_commands(tox_env, exit_code, outcomes):
+    if not isinstance(tox_env, CurrentEnv) or isinstance(tox_env, PrintEnv):
+        return
+    metrics.observe_result(tox_env.name, exit_code)
+    if tox_env._run_cached:
+        logging.warning(
+            "cached: passed before with the same sources, commands and installed distributions"
+        )
+        if tox_env.journal:
+            tox_env.journal["current_env_cached"] = True
+        return  # nothing ran
+    if exit_code == 0 and tox_env._run_cache is not None:
+        work_dir = tox_env.core["work_dir"]
+        key, sources = tox_env._run_cache
+        after = runcache.source_digest(tox_env.core["tox_root"], work_dir)
+        runcache.record(work_dir, tox_env.name, key, [sources, after])
+    if exit_code == 0 and tox_env._commands_started is not None:
+        durations.record(
+            tox_env.core["work_dir"],
+            tox_env.name,
+            time.monotonic() - tox_env._commands_started,
+        )
+
+
+class Installer:
+    """Noop installer"""
+
+    def __init__(self, work_dir=None, tox_env=None):
+        self._work_dir = work_dir
+        self._tox_env = tox_env
+
+    def install(self, *args, **kwargs):
+        return None
+
+    @trace.traced("Installer.installed")
+    def installed(self):
+        """Return list of installed packages like `pip freeze`."""
+        if self._tox_env is not None and self._tox_env.env_python() != sys.executable:
+            return installed.installed(
+                self._work_dir,
+                self._tox_env.env_python(),
+                self._tox_env._interpreter()["path"],
+            )
+        return installed.installed(self._work_dir)
+
+
+class CurrentEnvLocalSubProcessExecutor(Execute):
+    def __init__(self, colored, fork_server_modules=None):
+        super().__init__(colored)
+        self._fork_server_modules = fork_server_modules
+
+    @contextmanager
+    def call(self, request, show, out_err, env):
+        if env._run_cached:
+            with super().call(request, show, out_err, env) as status:
+                yield status
+            return
+        with trace.span("command", "subprocess", env=env.name, cmd=request.shell_cmd) as args:
+            with super().call(request, show, out_err, env) as status:
+                yield status
+            args["exit_code"] = status.exit_code
+        metrics.observe_command(env.name, status.outcome.elapsed, status.exit_code)
+
+    def build_instance(
+        self,
+        request,
+        options,
+        out,
+        err,
+    ):
+        request.env["PATH"] = ":".join(
+            (str(options._env.env_dir / "bin"), request.env.get("PATH", ""))
+        )
+        if options._env._run_cached:
+            return CachedExecuteInstance(request, options, out, err)
+        if self._fork_server_modules is not None and forkserver.supported():
+            return ForkServerExecuteInstance(
+                request, options, out, err, self._fork_server_modules
+            )
+        return LocalSubProcessExecuteInstance(request, options, out, err)
+
+
+class CachedExecuteStatus(ExecuteStatus):
+    """A command that succeeded without running"""
+
+    @property
+    def exit_code(self):
+        return Outcome.OK
+
+    def wait(self, timeout=None):
+        return Outcome.OK
+
+    def write_stdin(self, content):
+        pass
+
+    def interrupt(self):
+        pass
+
+
+class CachedExecuteInstance(LocalSubProcessExecuteInstance):
+    """Doesn't run the command, the testenv passed before, see --current-env-cache"""
+
+    def __enter__(self):
+        return CachedExecuteStatus(self.options, self._out, self._err)
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+class ForkServerExecuteInstance(LocalSubProcessExecuteInstance):
+    """Runs Python commands in a process forked by the fork server,
+    other commands as regular subprocesses"""
+
+    def __init__(self, request, options, out, err, modules):
+        super().__init__(request, options, out, err)
+        self._modules = modules
+
+    def __enter__(self):
+        argv = forkserver.python_argv(self.cmd)
+        if argv is None or self.request.stdin == StdinSource.API:
+            return super().__enter__()
+
+        # The same as LocalSubProcessExecuteInstance.__enter__, with ForkedProcess for Popen
+        columns, lines = shutil.get_terminal_size(fallback=(-1, -1))
+        if columns != -1:
+            self.request.env.setdefault("COLUMNS", str(columns))
+        if lines != -1:
+            self.request.env.setdefault("LINES", str(lines))
+
+        stdout, stderr = self.get_stream_file_no("stdout"), self.get_stream_file_no("stderr")
+        try:
+            server = forkserver.get_server(
+                self._modules, self.request.env, str(self.request.cwd)
+            )
+            self.process = process = forkserver.ForkedProcess(
+                server,
+                argv,
+                self.cmd[0],
+                stdin={StdinSource.USER: None, StdinSource.OFF: subprocess.DEVNULL}[
+                    self.request.stdin
+                ],
+                stdout=next(stdout),
+                stderr=next(stderr),
+                cwd=str(self.request.cwd),
+                env=self.request.env,
+            )
+        except (OSError, RuntimeError) as exception:
+            logging.error("Exception running command in the fork server %s", str(exception))
+            return LocalSubprocessExecuteFailedStatus(
+                self.options, self._out, self._err, getattr(exception, "errno", None) or 1
+            )
+
+        status = LocalSubprocessExecuteStatus(self.options, self._out, self._err, process)
+        pid = process.pid
+        self._read_stderr = ReadViaThread(
+            stderr.send(process), self.err_handler, name=f"err-{pid}", drain=self._on_exit_drain
+        )
+        self._read_stderr.__enter__()
+        self._read_stdout = ReadViaThread(
+            stdout.send(process), self.out_handler, name=f"out-{pid}", drain=self._on_exit_drain
+        )
+        self._read_stdout.__enter__()
+        return status
+
+
+# The same for all testenvs, see CurrentEnv._get_python
+_python_info = None
+
+
+class CurrentEnv(PythonRun):
+    def __init__(self, create_args):
+        self._executor = None
+        self._installer = None
+        self._path = []
+        self._parallel_jobs = None
+        self._commands_started = None
+        # (key, source digest) to remember when the commands pass, see --current-env-cache
+        self._run_cache = None
+        self._run_cached = False
+        super().__init__(create_args)
+
+    @staticmethod
+    def id():
+        return "current-env"
+
+    @property
+    def _default_package_tox_env_type(self):
+        return None
+
+    @property
+    def _external_pkg_tox_env_type(self):
+        return None
+
+    @property
+    def _package_tox_env_type(self):
+        return None
+
+    @property
+    def executor(self):
+        if self._executor is None:
+            self._executor = CurrentEnvLocalSubProcessExecutor(
+                self.options.is_colored, self._fork_server_modules()
+            )
+        return self._executor
+
+    def _fork_server_modules(self):
+        modules = getattr(self.options, "current_env_fork_server", None)
+        if modules is None:
+            return None
+        return [m.strip() for m in modules.split(",") if m.strip()]
+
+    @trace.traced("CurrentEnv.setup")
+    def setup(self):
+        first = not self._run_state["setup"]
+        if first and self.options.current_env and getattr(self.options, "check_deps", False):
+            missing = self.missing_deps()
+            if missing:
+                raise Fail(
+                    "dependencies not satisfied by the installed packages: "
+                    + ", ".join(missing)
+                )
+        started = time.monotonic()
+        try:
+            super().setup()
+        finally:
+            if first:
+                metrics.observe_setup(self.name, time.monotonic() - started)
+
+    def _cache_dir(self):
+        if not getattr(self.options, "work_dir_cache", True):
+            return None
+        return self.core["work_dir"]
+
+    def _other_interpreters(self):
+        return self.options.current_env and getattr(
+            self.options, "current_env_interpreters", False
+        )
+
+    def _executable(self):
+        """The interpreter the commands run with"""
+        if not self._other_interpreters():
+            return sys.executable
+        return str(self.base_python.extra["executable"])
+
+    def _interpreter(self):
+        return interpreter.facts(self._cache_dir(), self._executable())
+
+    def missing_deps(self):
+        """The tox requires and deps the installed packages don't satisfy"""
+        if self._executable() == sys.executable:
+            index = depcheck.index(self._cache_dir())
+            environment = None
+        else:
+            facts = self._interpreter()
+            index = depcheck.index(self._cache_dir(), self._executable(), facts["path"])
+            environment = depcheck.marker_environment(facts)
+        lines = [str(requirement) for requirement in self.core["requires"]]
+        lines += self.conf["deps"].lines()
+        return depcheck.unsatisfied(lines, index, self.core["toxinidir"], environment)
+
+    @trace.traced("CurrentEnv._get_python")
+    def _get_python(self, base_python):
+        if self._other_interpreters():
+            executable = _find_interpreter(base_python)
+            if executable is None:
+                return None
+            if executable != sys.executable:
+                facts = interpreter.facts(self._cache_dir(), executable)
+                if facts is None:
+                    return None
+                return PythonInfo(
+                    implementation=facts["implementation"],
+                    version_info=VersionInfo(*facts["version_info"]),
+                    version=facts["version"],
+                    is_64=facts["is_64"],
+                    platform=facts["platform"],
+                    extra={"executable": Path(facts["executable"])},
+                )
+        global _python_info
+        if _python_info is None:
+            facts = interpreter.facts(self._cache_dir())
+            _python_info = PythonInfo(
+                implementation=sys.implementation,
+                version_info=sys.version_info,
+                version=sys.version,
+                is_64=facts["is_64"],
+                platform=facts["platform"],
+                extra={"executable": Path(sys.executable)},
+            )
+        return _python_info
+
+    def _clean(self, transitive=False):
+        """tox removes the environment before it's created again,
+        we move it to the trash not to wait for that"""
+        if not self._run_state["clean"]:
+            manifest.forget(self.env_dir)
+            trash.discard_contents(
+                self.env_dir, self.core["work_dir"], keep=("file.lock",)
+            )
+        super()._clean(transitive)
+
+    def ensure_python_env(self):
+        trash.reap(self.core["work_dir"])
+        found = manifest.read(self.env_dir)
+        if found is not None and found.get("mode") == manifest.REGULAR:
+            # tox recreates environments made by another runner on its own,
+            # but not when its .tox-info.json is gone, the manifest still tells
+            self._clean()
+        super().ensure_python_env()
+        # tox only creates the environment when its own cache doesn't match,
+        # our manifest also knows about the interpreter and the plugin version
+        self.create_python_env()
+
+    @trace.traced("CurrentEnv.create_python_env")
+    def create_python_env(self):
+        """Fake Python environment just to make sure all possible
+        commands like python or python3 works.
+
+        Other tox processes may set up the same environment at the same time,
+        so existing files are fine and symlinks are replaced atomically.
+        The manifest says when the symlinks of a previous run are still right."""
+        executable = self._executable()
+        expected = manifest.expected(manifest.CURRENT_ENV, executable)
+        if manifest.read(self.env_dir) == expected:
+            return
+        bindir = self.env_dir / "bin"
+        bindir.mkdir(parents=True, exist_ok=True)
+        version_info = self.base_python.version_info
+        for suffix in (
+            "",
+            f"{version_info.major}",
+            f"{version_info.major}.{version_info.minor}",
+        ):
+            _symlink(executable, bindir / f"python{suffix}")
+        manifest.write(self.env_dir, expected)
+
+    @property
+    def environment_variables(self):
+        env = super().environment_variables
+        if not self.options.current_env:
+            return env
+        if self._parallel_jobs is None:
+            self._parallel_jobs = self.core["current_env_parallel_jobs"]
+        if self._parallel_jobs > 1:
+            # Keep the environments running in parallel from sharing
+            # temporary files and caches and from oversubscribing the CPUs.
+            set_env = self.conf["set_env"]
+            dirs = {name: self.env_tmp_dir for name in TMPDIR_ENV_VARS}
+            dirs.update({name: self.env_dir / "cache" for name in CACHE_DIR_ENV_VARS})
+            for name, path in dirs.items():
+                if name not in set_env:
+                    path.mkdir(parents=True, exist_ok=True)
+                    env[name] = str(path)
+            cpus = str(max(1, _cpu_count() // self._parallel_jobs))
+            for name in CPU_BUDGET_ENV_VARS:
+                env.setdefault(name, cpus)
+        return env
+
+    def env_bin_dir(self):
+        return Path(self._interpreter()["scripts"])
+
+    def env_python(self):
+        return self._executable()
+
+    def env_site_package_dir(self):
+        return Path(self._interpreter()["purelib"])
+
+    @property
+    def installer(self):
+        return Installer(self.core["work_dir"], self)
+
+    def prepend_env_var_path(self):
+        return [self.env_bin_dir()]
+
+    @property
+    def runs_on_platform(self):
+        return sys.platform
+
+    @classmethod
+    def python_spec_for_path(cls, path):
+        # Needed for https://github.com/fedora-python/tox-current-env/issues/77
+        # This is a copy of an internal tox method added in
+        #   https://github.com/tox-dev/tox/pull/3327
+        implementation = sys.implementation.name
+        version = sys.version_info
+        bits = "64" if sys.maxsize > 2**32 else "32"
+        string_spec = f"{implementation}{version.major}{version.minor}-{bits}"
+        return PythonSpec.from_string_spec(string_spec)
+
+
+@trace.traced("symlink", "filesystem")
+def _symlink(target, link):
+    """Create or replace link pointing to target, atomically"""
+    if os.path.islink(link) and os.readlink(link) == target:
+        return
+    tmp = link.with_name(f".{link.name}.{os.getpid()}.{threading.get_ident()}")
+    os.symlink(target, tmp)
+    os.replace(tmp, link)
+
+
+class PrintEnv(CurrentEnv):
+    def __init__(self, create_args):
+        super().__init__(create_args)
+
+        if (
+            self.options.print_extras_to
+            or self.options.print_expanded_extras_to
+            or self.options.print_manifest_to
+        ):
+            if "extras" not in self.conf:
+                # Unfortunately, if there is skipsdist/no_package or skip_install
+                # in the config, this section is not parsed at all so we have to
+                # do it here manually to be able to read its content.
+                self.conf.add_config(
+                    keys=["extras"],
+                    of_type=Set[str],
+                    default=set(),
+                    desc="extras to install of the target package",
+                )
+
+    def create_python_env(self):
+        """We don't need any environment for this plugin"""
+        return None
+
+    def _cached(self, name, evaluate):
+        resolved = configcache.resolved(self.core["work_dir"], self.name)
+        if resolved is None:
+            return evaluate()
+        return resolved.get(name, evaluate)
+
+    def _save_cache(self):
+        resolved = configcache.resolved(self.core["work_dir"], self.name)
+        if resolved is not None:
+            resolved.save()
+
+    def requires(self):
+        """tox requires (including tox itself with its minimal version)"""
+        return self._cached(
+            "requires",
+            lambda: [str(requirement) for requirement in self.core["requires"]],
+        )
+
+    def deps(self):
+        return self._cached("deps", lambda: self.conf["deps"].lines())
+
+    def extras(self):
+        return self._cached("extras", lambda: list(self.conf["extras"]))
+
+    def _project_root(self):
+        try:
+            return self.core["package_root"]
+        except KeyError:
+            return self.core["tox_root"]
+
+    def expanded_extras(self):
+        """Requirements of the extras, see the optdeps module"""
+        extras = self.extras()
+        if not extras:
+            return []
+        try:
+            project = optdeps.for_project(self._project_root(), self._cache_dir())
+            return project.expand(sorted(extras))
+        except optdeps.ExtrasError as exc:
+            raise Fail(str(exc)) from None
+
+    def dependency_groups(self):
+        if "dependency_groups" not in self.conf:
+            raise RuntimeError(
+                "tox is too old to know about dependency_groups."
+            )
+        return self._cached(
+            "dependency_groups", lambda: list(self.conf["dependency_groups"])
+        )
+
+    def expanded_dependency_groups(self):
+        """Requirements of the dependency_groups, see the depgroups module"""
+        groups = self.dependency_groups()
+        if not groups:
+            return []
+        try:
+            return depgroups.for_project(self._project_root()).expand(sorted(groups))
+        except depgroups.GroupError as exc:
+            raise Fail(str(exc)) from None
+
+    def result(self):
+        """All of the above as an EnvResult,
+        dependency_groups are empty when tox doesn't know about them"""
+        result = EnvResult(
+            requires=self.requires(),
+            deps=self.deps(),
+            extras=self.extras(),
+            dependency_groups=(
+                self.dependency_groups() if "dependency_groups" in self.conf else []
+            ),
+        )
+        self._save_cache()
+        return result
+
+    @trace.traced("PrintEnv.prepend_env_var_path")
+    def prepend_env_var_path(self):
+        """Usage of this method for the core of this plugin is far from perfect
+        but this method is called every time even without recreated environment"""
+        if self.options.print_deps_to:
+            print(
+                *self.requires(),
+                *self.deps(),
+                sep="\n",
+                file=self.options.print_deps_to,
+            )
+            self.options.print_deps_to.flush()
+
+        if self.options.print_extras_to:
+            print(
+                *self.extras(),
+                sep="\n",
+                file=self.options.print_extras_to,
+            )
+            self.options.print_extras_to.flush()
+
+        if self.options.print_expanded_extras_to:
+            print(
+                *self.expanded_extras(),
+                sep="\n",
+                file=self.options.print_expanded_extras_to,
+            )
+            self.options.print_expanded_extras_to.flush()
+
+        if self.options.print_dependency_groups_to:
+            print(
+                *self.dependency_groups(),
+                sep="\n",
+                file=self.options.print_dependency_groups_to,
+            )
+            self.options.print_dependency_groups_to.flush()
+
+        if self.options.print_expanded_dependency_groups_to:
+            print(
+                *self.expanded_dependency_groups(),
+                sep="\n",
+                file=self.options.print_expanded_dependency_groups_to,
+            )
+            self.options.print_expanded_dependency_groups_to.flush()
+
+        if self.options.print_manifest_to:
+            print(
+                json.dumps({"env": self.name, **self.result()._asdict()}),
+                file=self.options.print_manifest_to,
+            )
+            self.options.print_manifest_to.flush()
+
+        if self.options.print_missing_deps_to:
+            missing = self.missing_deps()
+            if missing:
+                print(*missing, sep="\n", file=self.options.print_missing_deps_to)
+            self.options.print_missing_deps_to.flush()
+
+        self._save_cache()
+
+        # https://github.com/fedora-python/tox-current-env/issues/75
+        return super().prepend_env_var_path()
+
+    @staticmethod
+    def id():
+        return "print-env"
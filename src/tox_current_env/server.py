@@ -0,0 +1,101 @@
+"""A server answering --print-*-to queries over a Unix socket, and its client.
+
+The server keeps tox and this plugin imported and the loaded tox configuration
+of the queried projects in memory, until their configuration files change.
+Requests and responses are JSON documents, one per line."""
+
+import json
+import os
+import signal
+import socket
+import socketserver
+import sys
+
+from tox_current_env.api import EnvResult, Resolver
+
+CONFIG_FILES = ("tox.ini", "tox.toml", "pyproject.toml", "setup.cfg", "setup.py")
+
+
+def config_mtimes(project_dir):
+    """Modification times of all the files tox might read the configuration from"""
+    mtimes = []
+    for name in CONFIG_FILES:
+        try:
+            mtimes.append(os.stat(os.path.join(project_dir, name)).st_mtime_ns)
+        except OSError:
+            mtimes.append(None)
+    return mtimes
+
+
+class ResolverCache:
+    """Resolvers by project and selected environments,
+    reloaded when the configuration files of the project change"""
+
+    def __init__(self):
+        self._resolvers = {}
+
+    def get(self, project_dir, envs=None):
+        project_dir = os.path.abspath(project_dir)
+        key = project_dir, None if envs is None else tuple(envs)
+        mtimes = config_mtimes(project_dir)
+        cached = self._resolvers.get(key)
+        if cached is None or cached[0] != mtimes:
+            cached = mtimes, Resolver(project_dir, envs)
+            self._resolvers[key] = cached
+        return cached[1]
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            try:
+                request = json.loads(line)
+                resolver = self.server.resolvers.get(
+                    request["project_dir"], request.get("envs")
+                )
+                response = {
+                    "results": {
+                        name: result._asdict()
+                        for name, result in resolver.resolve().items()
+                    }
+                }
+            except (Exception, SystemExit) as e:
+                # tox reports some problems (such as invalid arguments) by exiting
+                response = {"error": f"{type(e).__name__}: {e}"}
+            self.wfile.write(json.dumps(response).encode("utf-8") + b"\n")
+            self.wfile.flush()
+
+
+class Server(socketserver.UnixStreamServer):
+    """Handles one connection at a time, the tox state is not thread safe"""
+
+    def __init__(self, path):
+        self.resolvers = ResolverCache()
+        super().__init__(path, _Handler)
+
+
+def serve(path):
+    """Serve on the Unix socket at path until terminated"""
+    if os.path.exists(path):
+        os.unlink(path)  # stale socket from a killed server
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    with Server(path) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            os.unlink(path)
+
+
+def query(path, project_dir, envs=None):
+    """Ask the server listening at path, return a dict of EnvResults like Resolver.resolve()"""
+    request = {"project_dir": os.path.abspath(project_dir), "envs": envs}
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            response = json.loads(f.readline())
+    if "error" in response:
+        raise RuntimeError(response["error"])
+    return {name: EnvResult(**result) for name, result in response["results"].items()}
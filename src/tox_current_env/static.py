@@ -0,0 +1,403 @@
+"""Answer --print-*-to queries by reading the tox configuration directly, without tox.
+
+Starting tox takes most of the time of such queries, yet for simple configurations
+the answer only needs the configuration file and the factor conditions of its lines.
+This module reads tox.ini, setup.cfg, pyproject.toml ([tool.tox] or legacy_tox_ini)
+and tox.toml the same way tox 4 does, but it doesn't do substitutions,
+generative section names, labels etc. Whenever the configuration or the environment
+uses anything it cannot evaluate (or that other tox plugins might change),
+Unsupported is raised and the caller should use tox_current_env.api instead.
+"""
+
+import configparser
+import os
+import re
+import sys
+from itertools import groupby, product
+
+from tox_current_env.api import EnvResult
+
+# Since this version, tox knows about dependency_groups
+MIN_TOX_VERSION = (4, 22)
+
+CORE_KEYS = {
+    "env_list": ("env_list", "envlist"),
+    "requires": ("requires",),
+    "min_version": ("min_version", "minversion"),
+}
+
+# Keys changing how the environments are loaded, this module doesn't evaluate those.
+UNSUPPORTED_KEYS = ("base", "runner", "labels")
+
+
+class Unsupported(Exception):
+    """The configuration cannot be evaluated without tox"""
+
+
+def _tox_version():
+    try:
+        import importlib.metadata as importlib_metadata
+    except ImportError:
+        import importlib_metadata
+    try:
+        version = importlib_metadata.version("tox")
+    except importlib_metadata.PackageNotFoundError:
+        raise Unsupported("tox is not installed") from None
+    return tuple(int(part) for part in re.findall(r"\d+", version)[:2])
+
+
+def _other_plugins():
+    try:
+        import importlib.metadata as importlib_metadata
+    except ImportError:
+        import importlib_metadata
+    entry_points = importlib_metadata.entry_points()
+    if hasattr(entry_points, "select"):
+        tox_entry_points = entry_points.select(group="tox")
+    else:
+        tox_entry_points = entry_points.get("tox", [])
+    return sorted(
+        ep.name for ep in tox_entry_points
+        if not ep.value.startswith("tox_current_env")
+    )
+
+
+def _user_config_file():
+    path = os.environ.get("TOX_USER_CONFIG_FILE")
+    if path:
+        return path
+    from platformdirs import user_config_dir
+
+    return os.path.join(user_config_dir("tox"), "config.ini")
+
+
+def check_environment(project_dir):
+    """Raise Unsupported if anything but the configuration might influence the result"""
+    if _tox_version() < MIN_TOX_VERSION:
+        raise Unsupported(
+            "tox older than {}.{} is installed".format(*MIN_TOX_VERSION)
+        )
+    tox_vars = sorted(name for name in os.environ if name.startswith("TOX_"))
+    if tox_vars:
+        raise Unsupported(f"tox environment variables are set: {', '.join(tox_vars)}")
+    if os.path.exists(_user_config_file()):
+        raise Unsupported("the tox user configuration file exists")
+    if os.path.exists(os.path.join(project_dir, "toxfile.py")):
+        raise Unsupported("the project has an inline tox plugin (toxfile.py)")
+    plugins = _other_plugins()
+    if plugins:
+        raise Unsupported(f"other tox plugins are installed: {', '.join(plugins)}")
+
+
+# Factor conditions, the same as tox.config.loader.ini.factor
+
+_FACTOR_RE = re.compile(r"(?:!?[\w._][\w._-]*|^$)")
+
+
+def _expand_env_with_negation(value):
+    """Transform '{py,!pi}-{a,b},c' to ['py-a', 'py-b', '!pi-a', '!pi-b', 'c']"""
+    for key, group in groupby(re.split(r"((?:{[^}]+})+)|,", value), key=bool):
+        if key:
+            group_str = "".join(group).strip()
+            elements = re.split(r"{([^}]+)}", group_str)
+            parts = [[i.strip() for i in elem.split(",")] for elem in elements]
+            for variant in product(*parts):
+                variant_str = "".join(variant)
+                if not all(_FACTOR_RE.fullmatch(i) for i in variant_str.split("-")):
+                    raise ValueError(variant_str)
+                yield variant_str
+
+
+def _find_factor_groups(value):
+    for env in _expand_env_with_negation(value):
+        yield [(f[1:], True) if f.startswith("!") else (f, False) for f in env.split("-")]
+
+
+def _expand_factors(value):
+    for line in value.split("\n"):
+        factors = None
+        marker_search = re.search(r":(\s|$)", line)
+        marker_at, content = marker_search.start() if marker_search else -1, line
+        if marker_at != -1:
+            try:
+                factors = list(_find_factor_groups(line[:marker_at].strip()))
+            except ValueError:
+                pass  # when cannot extract factors keep the entire line
+            else:
+                content = line[marker_at + 1:].strip()
+        yield factors, content
+
+
+def filter_for_env(value, env_name):
+    """Lines of value with factor conditions matching env_name
+    (env_name None is the core section, where only negated conditions can match)"""
+    current = set()
+    if env_name is not None:
+        current = {name for group in _find_factor_groups(env_name) for name, _ in group}
+    lines = []
+    for factors, content in _expand_factors(value):
+        if factors is None:
+            if content:
+                lines.append(content)
+        elif any(
+            all((name in current) ^ negate for name, negate in group)
+            for group in factors
+        ):
+            lines.append(content)
+    return lines
+
+
+def _expand_ranges(value):
+    """Expand ranges in env expressions, eg py3{10-13} -> py3{10,11,12,13}"""
+    for src, start, end in re.findall(r"((\d+)-(\d+)|\d+)(?:,|})", value):
+        if src and start and end:
+            step = 1 if int(start) < int(end) else -1
+            expansion = ",".join(str(x) for x in range(int(start), int(end) + step, step))
+            value = value.replace(src, expansion, 1)
+    return value
+
+
+def _expand_env_list(lines):
+    envs = []
+    for line in lines:
+        for group in _find_factor_groups(_expand_ranges(line)):
+            env = "-".join(name for name, _ in group)
+            if env not in envs:
+                envs.append(env)
+    return envs
+
+
+# Configuration sources
+
+_COMMENTS_RE = re.compile(r"(\s)*(?<!\\)#.*")
+
+
+_FACTOR_GROUP_RE = re.compile(r"{[\w.,\s-]*}")
+
+
+def _without_substitutions(values, what, factor_groups=False):
+    """Check that values are strings without {substitutions},
+    factor_groups allows {a,b} and {1-3} (as in env_list)"""
+    for value in values:
+        if not isinstance(value, str):
+            raise Unsupported(f"{what} is not a list of strings")
+        if factor_groups:
+            value = _FACTOR_GROUP_RE.sub("", value)
+        if "{" in value or "}" in value:
+            raise Unsupported(f"{what} contains substitutions")
+    return list(values)
+
+
+class IniConfig:
+    """tox configuration in the ini format"""
+
+    def __init__(self, parser, core_section):
+        self._parser = parser
+        self._core_section = core_section
+        for section in parser.sections():
+            if section.startswith("testenv") and "{" in section:
+                raise Unsupported(f"generative section name [{section}]")
+            for key in UNSUPPORTED_KEYS:
+                if parser.has_option(section, key):
+                    raise Unsupported(f"{key} in [{section}]")
+
+    @classmethod
+    def from_string(cls, content, core_section="tox"):
+        parser = configparser.ConfigParser(interpolation=None)
+        parser.read_string(content)
+        return cls(parser, core_section)
+
+    def _raw(self, sections, keys, env_name, factor_groups=False):
+        for section in sections:
+            for key in keys:
+                if self._parser.has_option(section, key):
+                    value = self._parser.get(section, key)
+                    lines = []
+                    for line in value.split("\n"):
+                        if not line.startswith("#"):
+                            lines.append(_COMMENTS_RE.sub("", line).replace("\\#", "#"))
+                    value = "\n".join(lines).replace("\r", "")
+                    if "\\\n" in value:
+                        raise Unsupported(f"{key} in [{section}] contains line continuations")
+                    return _without_substitutions(
+                        filter_for_env(value, env_name),
+                        f"{key} in [{section}]",
+                        factor_groups,
+                    )
+        return None
+
+    @staticmethod
+    def _to_list(lines):
+        # Like tox, split on commas when there is only one line
+        if lines is not None and len(lines) == 1:
+            return [v.strip() for v in lines[0].split(",") if v.strip()]
+        return lines
+
+    def core(self, name):
+        lines = self._raw(
+            [self._core_section], CORE_KEYS[name], None, factor_groups=name == "env_list"
+        )
+        if name == "env_list":
+            return None if lines is None else _expand_env_list(lines)
+        if name == "min_version":
+            return None if not lines else lines[0]
+        return self._to_list(lines)
+
+    def has_env(self, env_name):
+        return self._parser.has_section(f"testenv:{env_name}")
+
+    def env(self, env_name, key):
+        sections = [f"testenv:{env_name}", "testenv"]
+        lines = self._raw(sections, (key,), env_name)
+        if key == "deps":
+            if any(line.startswith("-") for line in lines or []):
+                raise Unsupported("deps contain pip options")
+            return lines
+        return self._to_list(lines)
+
+
+class TomlConfig:
+    """tox configuration in the TOML format (tox.toml or [tool.tox] in pyproject.toml)"""
+
+    def __init__(self, content):
+        self._content = content
+        self._tables = [content, content.get("env_run_base", {})]
+        self._tables.extend(content.get("env", {}).values())
+        for table in self._tables:
+            if not isinstance(table, dict):
+                raise Unsupported("tox environments are not tables")
+            for key in UNSUPPORTED_KEYS:
+                if key in table:
+                    raise Unsupported(f"{key} in the tox configuration")
+
+    def _value(self, tables, keys, what):
+        for table in tables:
+            for key in keys:
+                if key in table:
+                    value = table[key]
+                    if what == "min_version":
+                        value = [value]
+                    if not isinstance(value, list):
+                        raise Unsupported(f"{key} is not a list")
+                    return _without_substitutions(value, key)
+        return None
+
+    def core(self, name):
+        value = self._value([self._content], CORE_KEYS[name], name)
+        if name == "min_version":
+            return None if not value else value[0]
+        return value
+
+    def has_env(self, env_name):
+        return env_name in self._content.get("env", {})
+
+    def env(self, env_name, key):
+        tables = [self._content.get("env", {}).get(env_name, {}), self._content.get("env_run_base", {})]
+        return self._value(tables, (key,), key)
+
+
+def _load_toml(path):
+    if sys.version_info >= (3, 11):
+        import tomllib
+    else:
+        try:
+            import tomli as tomllib
+        except ImportError:
+            raise Unsupported("no TOML parser is available") from None
+    with open(path, "rb") as f:
+        return tomllib.load(f)
+
+
+def load_config(project_dir):
+    """The configuration of project_dir, discovered in the same order as tox does"""
+    path = os.path.join(project_dir, "tox.ini")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return IniConfig.from_string(f.read())
+
+    path = os.path.join(project_dir, "setup.cfg")
+    if os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            config = IniConfig.from_string(f.read(), core_section="tox:tox")
+        if config._parser.has_section("tox:tox"):
+            return config
+
+    path = os.path.join(project_dir, "pyproject.toml")
+    if os.path.exists(path):
+        tox_table = _load_toml(path).get("tool", {}).get("tox")
+        if isinstance(tox_table, dict):
+            if "legacy_tox_ini" in tox_table:
+                return IniConfig.from_string(tox_table["legacy_tox_ini"])
+            return TomlConfig(tox_table)
+
+    path = os.path.join(project_dir, "tox.toml")
+    if os.path.exists(path):
+        return TomlConfig(_load_toml(path))
+
+    raise Unsupported(f"no tox configuration found in {project_dir}")
+
+
+# packaging is only imported when needed, it takes a considerable part of the run time
+
+
+def _requires(config):
+    """tox requires, normalized by packaging and with tox itself, like tox does"""
+    requires = config.core("requires") or []
+    min_version = config.core("min_version")
+    if not requires and not min_version:
+        return ["tox"]
+    from packaging.requirements import InvalidRequirement, Requirement
+    from packaging.version import InvalidVersion, Version
+
+    try:
+        requires = [str(Requirement(r)) for r in requires]
+        requires.append(str(Requirement(f"tox>={Version(min_version)}" if min_version else "tox")))
+    except (InvalidRequirement, InvalidVersion) as e:
+        raise Unsupported(f"invalid requires: {e}") from None
+    return requires
+
+
+def _canonicalize_names(names):
+    # The same as packaging.utils.canonicalize_name
+    return [re.sub(r"[-_.]+", "-", name).lower() for name in names or []]
+
+
+def resolve(project_dir, envs=None):
+    """Return a dict of EnvResults like tox_current_env.api.resolve() does,
+    or raise Unsupported"""
+    project_dir = os.path.abspath(project_dir)
+    check_environment(project_dir)
+    try:
+        config = load_config(project_dir)
+    except (configparser.Error, ValueError, UnicodeDecodeError) as e:
+        raise Unsupported(f"cannot read the configuration: {e}") from None
+
+    env_list = config.core("env_list") or []
+    if envs is None:
+        if not env_list:
+            raise Unsupported("no env_list and no environments given")
+        envs = env_list
+    for env_name in envs:
+        if env_name == "ALL":
+            raise Unsupported("all environments requested")
+        if env_name not in env_list and not config.has_env(env_name):
+            raise Unsupported(f"environment {env_name} is not defined explicitly")
+
+    requires = _requires(config)
+
+    def unique(values):
+        return list(dict.fromkeys(values or []))
+
+    return {
+        env_name: EnvResult(
+            requires=list(requires),
+            deps=config.env(env_name, "deps") or [],
+            # tox doesn't normalize extras for print-env (it doesn't register them),
+            # but it does normalize dependency_groups
+            extras=unique(config.env(env_name, "extras")),
+            dependency_groups=unique(
+                _canonicalize_names(config.env(env_name, "dependency_groups"))
+            ),
+        )
+        for env_name in envs
+    }
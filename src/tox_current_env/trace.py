@@ -0,0 +1,102 @@
+"""Opt-in timing of the plugin's hooks and of the work they do, see --current-env-trace.
+
+The durations are written as a Chrome trace (the JSON "Trace Event Format")
+when tox exits; open it in chrome://tracing or https://ui.perfetto.dev.
+Spans are cheap when tracing is off: only the clock is read."""
+
+import atexit
+import contextlib
+import functools
+import json
+import os
+import sys
+import threading
+import time
+
+# Complete ("X") trace events, None when not tracing
+_events = None
+_path = None
+_thread_names = {}
+_lock = threading.Lock()
+
+
+def start(path):
+    """Start recording, the trace is written to path when the process exits"""
+    global _events, _path
+    if _events is None:
+        _events = []
+        atexit.register(write)
+    _path = path
+
+
+def _now():
+    return time.perf_counter() * 1e6  # microseconds
+
+
+@contextlib.contextmanager
+def span(name, cat="hook", **args):
+    """Record the duration of the with block.
+    The yielded dict of arguments can be extended in the block.
+    A span that ends after start() is recorded, even if it started before."""
+    begin = _now()
+    try:
+        yield args
+    finally:
+        if _events is not None:
+            end = _now()
+            thread = threading.current_thread()
+            event = {
+                "name": name,
+                "cat": cat,
+                "ph": "X",
+                "ts": begin,
+                "dur": end - begin,
+                "pid": os.getpid(),
+                "tid": thread.ident,
+                "args": {k: v for k, v in args.items() if v is not None},
+            }
+            with _lock:
+                _thread_names[thread.ident] = thread.name
+                _events.append(event)
+
+
+def traced(name, cat="hook"):
+    """Decorator recording a span for each call.
+    When the first argument has a string name (a tox env or its config), it is recorded as env."""
+
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            env = getattr(args[0], "name", None) if args else None
+            with span(name, cat, env=env if isinstance(env, str) else None):
+                return func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def write():
+    """Write the recorded spans to the trace file"""
+    if _events is None or _path is None:
+        return
+    pid = os.getpid()
+    with _lock:
+        events = list(_events)
+        metadata = [
+            {"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "tox"}}
+        ] + [
+            {"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+            for tid, name in _thread_names.items()
+        ]
+    tmp = f"{_path}.{pid}.tmp"
+    try:
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"traceEvents": metadata + events, "displayTimeUnit": "ms"}, f)
+        os.replace(tmp, _path)
+    except OSError as exception:
+        print(f"tox-current-env: cannot write the trace: {exception}", file=sys.stderr)
+        try:
+            os.unlink(tmp)
+        except OSError:
+            pass
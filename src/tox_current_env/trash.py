@@ -0,0 +1,120 @@
+"""Removing environment directories without waiting for it.
+
+Removing a big virtualenv takes seconds. Instead, the directory (or its content)
+is renamed into a trash directory in the tox work dir, which is fast and atomic,
+and a background thread removes it. What the thread doesn't manage to remove
+before tox exits is removed by the next run, see reap()."""
+
+import os
+import queue
+import shutil
+import tempfile
+import threading
+
+from tox_current_env import cache, trace
+
+TRASH_NAME = "trash"
+
+_queue = None
+_lock = threading.Lock()
+# trash directories already reaped by this process
+_reaped = set()
+
+
+def _trash_dir(work_dir):
+    return cache.cache_path(work_dir, TRASH_NAME)
+
+
+def _worker(paths):
+    while True:
+        shutil.rmtree(paths.get(), ignore_errors=True)
+
+
+def _remove_later(path):
+    global _queue
+    with _lock:
+        if _queue is None:
+            _queue = queue.Queue()
+            # A daemon thread doesn't keep tox from exiting,
+            # the leftovers are reaped by the next run
+            threading.Thread(
+                target=_worker, args=(_queue,), name="tox-current-env-trash", daemon=True
+            ).start()
+    _queue.put(path)
+
+
+def _remove_now(path):
+    if os.path.isdir(path) and not os.path.islink(path):
+        shutil.rmtree(path, ignore_errors=True)
+    else:
+        try:
+            os.unlink(path)
+        except OSError:
+            pass
+
+
+def _new_bin(work_dir, name):
+    trash = _trash_dir(work_dir)
+    os.makedirs(trash, exist_ok=True)
+    return tempfile.mkdtemp(prefix=f"{name}-", dir=trash)
+
+
+@trace.traced("trash.discard", "filesystem")
+def discard(path, work_dir):
+    """Remove the directory path, in the background if it can be moved to the trash"""
+    path = str(path)
+    if not os.path.lexists(path):
+        return
+    reap(work_dir)
+    try:
+        target = _new_bin(work_dir, os.path.basename(path))
+        os.rename(path, os.path.join(target, os.path.basename(path)))
+    except OSError:
+        # e.g. the environment is on another filesystem than the work dir
+        _remove_now(path)
+    else:
+        _remove_later(target)
+
+
+@trace.traced("trash.discard_contents", "filesystem")
+def discard_contents(path, work_dir, keep=()):
+    """Remove everything in the directory path but the names in keep,
+    in the background if it can be moved to the trash"""
+    path = str(path)
+    try:
+        names = [name for name in os.listdir(path) if name not in keep]
+    except OSError:
+        return
+    if not names:
+        return
+    reap(work_dir)
+    try:
+        target = _new_bin(work_dir, os.path.basename(path))
+    except OSError:
+        target = None
+    for name in names:
+        entry = os.path.join(path, name)
+        if target is not None:
+            try:
+                os.rename(entry, os.path.join(target, name))
+                continue
+            except OSError:
+                pass
+        _remove_now(entry)
+    if target is not None:
+        _remove_later(target)
+
+
+def reap(work_dir):
+    """Remove what previous runs left in the trash, in the background"""
+    trash = _trash_dir(work_dir)
+    with _lock:
+        if trash in _reaped:
+            return
+        _reaped.add(trash)
+    try:
+        names = os.listdir(trash)
+    except OSError:
+        return
+    for name in names:
+        _remove_later(os.path.join(trash, name))
@@ -1,3 +1,4 @@
+import json
 import os
 import re
 import shutil
@@ -13,11 +14,16 @@ from utils import (
     NATIVE_EXECUTABLE,
     NATIVE_SITE_PACKAGES,
     NATIVE_TOXENV,
+    PYTHON_VERSION_DOT,
     TOX_VERSION,
     envs_from_tox_ini,
+    interpreter_queries,
     is_available,
     modify_config,
     needs_all_pythons,
+    needs_audit_hooks,
+    needs_importtime,
+    plugin_imports,
     tox,
     tox_footer,
 )
@@ -53,6 +59,42 @@ def test_missing_toxenv_current_env(python):
     assert result.returncode > 0
 
 
+def test_current_env_matching_only(projdir):
+    with modify_config(projdir / "tox.ini") as config:
+        config["tox"]["envlist"] = f"py27,{NATIVE_TOXENV},native,other"
+        config["testenv:native"] = {"basepython": f"python{PYTHON_VERSION_DOT}"}
+        config["testenv:other"] = {"basepython": "python2.7"}
+    result = tox("--current-env", "--current-env-matching-only")
+    ran = re.findall(r"^ +(\S+): commands succeeded", result.stdout, re.MULTILINE)
+    assert ran == [NATIVE_TOXENV, "native"]
+
+
+def test_current_env_matching_only_nothing_matches():
+    result = tox("-e", "py27", "--current-env", "--current-env-matching-only", check=False)
+    assert result.returncode > 0
+    assert "environment matches the current Python" in result.stderr
+
+
+@needs_audit_hooks
+def test_current_env_does_not_query_the_current_interpreter():
+    assert interpreter_queries("-e", NATIVE_TOXENV, "--current-env") == []
+
+
+@needs_audit_hooks
+def test_current_env_does_not_query_a_kept_fake_env():
+    tox("-e", NATIVE_TOXENV, "--current-env")
+    assert interpreter_queries("-e", NATIVE_TOXENV, "--current-env") == []
+
+
+@needs_audit_hooks
+def test_current_env_queries_an_ambiguous_interpreter(projdir, tmp_path):
+    python = tmp_path / "python"
+    python.symlink_to(sys.executable)
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv:ambiguous"] = {"basepython": str(python)}
+    assert interpreter_queries("-e", "ambiguous", "--current-env") == [str(python)]
+
+
 @needs_all_pythons
 def test_all_toxenv_current_env_skip_missing():
     result = tox("--current-env", "--skip-missing-interpreters", check=False)
@@ -398,6 +440,45 @@ def test_regular_after_current_is_supported():
     assert "--recreate" not in result.stderr
 
 
+def test_current_env_fake_env_is_reused():
+    tox("-e", NATIVE_TOXENV, "--current-env")
+    python = DOT_TOX / NATIVE_TOXENV / "bin" / "python"
+    marker = DOT_TOX / NATIVE_TOXENV / ".tox-current-env.json"
+    assert json.loads(marker.read_text())["executable"] == sys.executable
+    before = python.lstat()
+
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    after = python.lstat()
+    assert (after.st_ino, after.st_mtime_ns) == (before.st_ino, before.st_mtime_ns)
+
+
+def test_current_env_fake_env_of_other_plugin_version_is_recreated():
+    tox("-e", NATIVE_TOXENV, "--current-env")
+    python = DOT_TOX / NATIVE_TOXENV / "bin" / "python"
+    marker = DOT_TOX / NATIVE_TOXENV / ".tox-current-env.json"
+    manifest = json.loads(marker.read_text())
+    assert manifest["mode"] == "current-env"
+    marker.write_text(json.dumps({**manifest, "plugin": "0"}))
+    leftover = DOT_TOX / NATIVE_TOXENV / "leftover"
+    leftover.touch()
+
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert json.loads(marker.read_text())["plugin"] != "0"
+    assert python.is_symlink()
+    assert not leftover.exists()
+
+
+def test_regular_env_has_manifest():
+    tox("-e", NATIVE_TOXENV)
+    marker = DOT_TOX / NATIVE_TOXENV / ".tox-current-env.json"
+    assert json.loads(marker.read_text())["mode"] == "regular"
+    result = tox("-e", NATIVE_TOXENV, "--current-env", check=False)
+    assert result.returncode > 0
+    assert "not supported" in result.stderr
+
+
 def test_regular_after_killed_current_is_not_supported():
     # fake broken tox run
     shutil.rmtree(DOT_TOX, ignore_errors=True)
@@ -437,6 +518,27 @@ def test_regular_recreate_after_current():
     assert "--recreate" not in result.stderr
 
 
+def test_recreate_moves_environment_to_trash():
+    tox("-e", NATIVE_TOXENV)
+    assert (DOT_TOX / NATIVE_TOXENV / "bin" / "activate").exists()
+    result = tox("-re", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert not (DOT_TOX / NATIVE_TOXENV / "bin" / "activate").exists()
+    assert (DOT_TOX / ".current-env" / "trash").is_dir()
+
+    result = tox("-re", NATIVE_TOXENV)
+    assert f"/.tox/{NATIVE_TOXENV} is the exec_prefix" in result.stdout
+
+
+def test_trash_leftovers_are_reaped():
+    leftover = DOT_TOX / ".current-env" / "trash" / "py-leftover" / "py"
+    leftover.mkdir(parents=True)
+    (leftover / "file").write_text("")
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert not leftover.exists()
+
+
 def test_current_after_regular_is_not_supported():
     result = tox("-e", NATIVE_TOXENV)
     assert f"/.tox/{NATIVE_TOXENV} is the exec_prefix" in result.stdout
@@ -536,6 +638,17 @@ def test_noquiet_installed_packages(flag):
         assert all(re.match(r"\S+==\S+", p) for p in packages)
 
 
+def test_installed_packages_are_cached():
+    _ = tox("-e", NATIVE_TOXENV, "--current-env")
+    cache_file = DOT_TOX / ".current-env" / "installed.json"
+    cached = json.loads(cache_file.read_text())
+    assert any(p.startswith("tox==") for p in cached["value"])
+    cached["value"] = ["cached==1.0"]
+    cache_file.write_text(json.dumps(cached))
+    result = tox("-e", NATIVE_TOXENV, "--current-env", quiet=False)
+    assert f"{NATIVE_TOXENV} installed: cached==1.0" in result.stdout.splitlines()
+
+
 @pytest.mark.parametrize(
     "flag", ["--print-deps-to=-", "--print-extras-to=-", "--current-env"]
 )
@@ -620,3 +733,10 @@ def test_assert_config_option_with_pyproject_toml(projdir):
     '''))
     result = tox("-l", "--assert-config", check=False)
     assert result.returncode == 0
+
+
+@needs_importtime
+def test_plugin_is_not_imported_without_its_options():
+    imported = plugin_imports("-l")
+    assert "tox_current_env.hooks3" in imported
+    assert imported <= {"tox_current_env", "tox_current_env.hooks", "tox_current_env.hooks3"}
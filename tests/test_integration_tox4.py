@@ -1,7 +1,12 @@
+import json
 import os
 import re
 import shutil
+import subprocess
+import sys
+import tempfile
 import textwrap
+import time
 
 import pytest
 
@@ -10,10 +15,14 @@ from utils import (
     NATIVE_EXEC_PREFIX_MSG,
     NATIVE_SITE_PACKAGES,
     NATIVE_TOXENV,
+    PYTHON_VERSION_DOT,
     TOX_VERSION,
     envs_from_tox_ini,
+    is_available,
     modify_config,
     needs_all_pythons,
+    needs_importtime,
+    plugin_imports,
     prep_tox_output,
     tox,
     tox_footer,
@@ -289,6 +298,211 @@ def test_allenvs_print_dependency_groups_to_file(tmp_path, option, dependency_gr
     assert prep_tox_output(result.stdout) == expected
 
 
+@pytest.mark.parametrize("option", ("--print-manifest-to", "--print-manifest-to-file"))
+def test_allenvs_print_manifest_to_file(tmp_path, option):
+    manifestpath = tmp_path / "manifest.jsonl"
+    result = tox(option, str(manifestpath))
+    manifest = [json.loads(line) for line in manifestpath.read_text().splitlines()]
+    assert [m["env"] for m in manifest] == envs_from_tox_ini()
+    for m in manifest:
+        assert m["requires"] == ["tox"]
+        assert m["deps"] == ["six", "py"]
+        assert sorted(m["extras"]) == ["dev", "full"]
+        if (TOX_VERSION.major, TOX_VERSION.minor) >= (4, 22):
+            assert m["dependency_groups"] == ["dg1"]
+    expected = ""
+    for env in envs_from_tox_ini()[:-1]:
+        expected += f"{env}: OK\n"
+    expected += tox_footer(spaces=0) + "\n"
+    assert prep_tox_output(result.stdout) == expected
+
+
+def test_print_missing_deps(projdir, tmp_path):
+    (projdir / "requirements.txt").write_text("tox>=1\nnot-installed-anywhere\n")
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["deps"] = "\n".join(
+            [
+                "six",
+                "packaging",
+                "packaging>=9999",
+                "py; python_version < '3'",
+                "-r requirements.txt",
+            ]
+        )
+    path = tmp_path / "missing"
+    tox("-e", NATIVE_TOXENV, "--print-missing-deps-to", str(path))
+    assert path.read_text().splitlines() == [
+        "six",
+        "packaging>=9999",
+        "not-installed-anywhere",
+    ]
+
+
+def test_print_missing_deps_nothing_missing(projdir):
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["deps"] = "packaging"
+    result = tox("-e", NATIVE_TOXENV, "--print-missing-deps-to", "-")
+    assert prep_tox_output(result.stdout) == tox_footer(NATIVE_TOXENV, spaces=0) + "\n"
+
+
+def test_current_env_check_deps(projdir):
+    result = tox("-e", NATIVE_TOXENV, "--current-env", "--check-deps", check=False)
+    assert result.returncode > 0
+    assert "dependencies not satisfied by the installed packages: six, py" in result.stdout
+    assert "is the exec_prefix" not in result.stdout
+
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["deps"] = "packaging"
+    result = tox("-e", NATIVE_TOXENV, "--current-env", "--check-deps")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+
+
+def test_print_expanded_dependency_groups(projdir, dependency_groups_support):
+    with open(projdir / "pyproject.toml", "a") as f:
+        f.write(
+            textwrap.dedent(
+                """
+                test = ["pytest>=7", {include-group = "Typing"}, "build >= 1"]
+                typing = ["mypy", {include-group = "dg1"}]
+                """
+            )
+        )
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["dependency_groups"] = "dg1\ntest"
+    result = tox("-e", NATIVE_TOXENV, "--print-expanded-dependency-groups-to", "-")
+    expected = textwrap.dedent(
+        f"""
+        build>=1
+        pytest>=7
+        mypy
+        {tox_footer(NATIVE_TOXENV)}
+        """
+    ).lstrip()
+    assert prep_tox_output(result.stdout) == expected
+
+
+def test_print_expanded_dependency_groups_cycle(projdir, dependency_groups_support):
+    with open(projdir / "pyproject.toml", "a") as f:
+        f.write(
+            textwrap.dedent(
+                """
+                a = [{include-group = "b"}]
+                b = ["six", {include-group = "a"}]
+                """
+            )
+        )
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["dependency_groups"] = "a"
+    result = tox(
+        "-e", NATIVE_TOXENV, "--print-expanded-dependency-groups-to", "-", check=False
+    )
+    assert result.returncode > 0
+    assert "dependency groups include each other: a -> b -> a" in result.stdout
+
+
+def test_print_expanded_extras_static(projdir):
+    with open(projdir / "pyproject.toml", "a") as f:
+        f.write(
+            textwrap.dedent(
+                """
+                [project]
+                name = "test"
+                version = "0"
+
+                [project.optional-dependencies]
+                dev = ["pytest>=7", "test[full]"]
+                full = ["six", "py; python_version < '3'", "pytest >= 7"]
+                """
+            )
+        )
+    result = tox("-e", NATIVE_TOXENV, "--print-expanded-extras-to", "-")
+    expected = textwrap.dedent(
+        f"""
+        pytest>=7
+        six
+        {tox_footer(NATIVE_TOXENV)}
+        """
+    ).lstrip()
+    assert prep_tox_output(result.stdout) == expected
+    # The build backend was not needed
+    assert not (projdir / ".tox" / ".current-env" / "extras-metadata.json").exists()
+
+
+def test_print_expanded_extras_from_build_backend_are_cached(projdir):
+    # An in-tree backend, setuptools may need wheel to prepare the metadata
+    (projdir / "pyproject.toml").write_text(
+        textwrap.dedent(
+            """
+            [build-system]
+            requires = []
+            build-backend = "backend"
+            backend-path = ["."]
+
+            [dependency-groups]
+            dg1 = ["build>=1"]
+            """
+        )
+    )
+    (projdir / "backend.py").write_text(
+        textwrap.dedent(
+            """
+            import os
+
+            def prepare_metadata_for_build_wheel(metadata_directory, config_settings=None):
+                os.mkdir(os.path.join(metadata_directory, "test-0.dist-info"))
+                with open(os.path.join(metadata_directory, "test-0.dist-info", "METADATA"), "w") as f:
+                    f.write(
+                        "Metadata-Version: 2.1\\nName: test\\nVersion: 0\\n"
+                        "Requires-Dist: pytest\\n"
+                        "Provides-Extra: full\\n"
+                        'Requires-Dist: six ; extra == "full"\\n'
+                        'Requires-Dist: py ; python_version >= "3" and extra == "full"\\n'
+                    )
+                return "test-0.dist-info"
+
+            def build_wheel(wheel_directory, config_settings=None, metadata_directory=None):
+                raise NotImplementedError
+            """
+        )
+    )
+    result = tox("-e", NATIVE_TOXENV, "--print-expanded-extras-to", "-")
+    expected = textwrap.dedent(
+        f"""
+        six
+        py
+        {tox_footer(NATIVE_TOXENV)}
+        """
+    ).lstrip()
+    assert prep_tox_output(result.stdout) == expected
+
+    cache_file = projdir / ".tox" / ".current-env" / "extras-metadata.json"
+    cached = json.loads(cache_file.read_text())
+    cached["value"]["requires_dist"] = ['cached; extra == "full"']
+    cache_file.write_text(json.dumps(cached))
+    result = tox("-e", NATIVE_TOXENV, "--print-expanded-extras-to", "-")
+    assert "cached" in result.stdout.splitlines()
+
+    # A changed source tree invalidates the cache
+    (projdir / "module.py").write_text("")
+    result = tox("-e", NATIVE_TOXENV, "--print-expanded-extras-to", "-")
+    assert prep_tox_output(result.stdout) == expected
+
+
+def test_print_manifest_deps_to_same_file_is_not_possible(tmp_path):
+    path = tmp_path / "manifest"
+    result = tox(
+        "-e",
+        NATIVE_TOXENV,
+        "--print-deps-to",
+        str(path),
+        "--print-manifest-to",
+        str(path),
+        check=False,
+    )
+    assert result.returncode > 0
+    assert "cannot be identical" in result.stderr
+
+
 def test_allenvs_print_deps_to_existing_file(tmp_path):
     depspath = tmp_path / "deps"
     depspath.write_text("nada")
@@ -593,6 +807,473 @@ def test_report_installed(projdir):
     assert "pytest==" in result.stdout
 
 
+def test_report_installed_is_sorted(projdir):
+    env = {"CI": "true"}
+    result = tox("-e", NATIVE_TOXENV, "--current-env", env=env, quiet=False)
+    line = next(l for l in result.stdout.splitlines() if "tox==" in l)
+    packages = line.rpartition(" ")[-1].split(",")
+    assert all(re.match(r"\S+==\S+", p) for p in packages)
+    assert packages == sorted(packages, key=lambda p: p.partition("==")[0].lower())
+
+
+def test_report_installed_uses_metadata_names(projdir):
+    # The current directory is on sys.path of tox
+    for dirname, name in (
+        ("mixedcase-1.0.dist-info", "MixedCase"),
+        ("dotted_name-1.0.dist-info", "dotted.name"),
+        ("Legacy-1.0.dist-info", "Legacy"),
+    ):
+        (projdir / dirname).mkdir()
+        (projdir / dirname / "METADATA").write_text(
+            f"Metadata-Version: 2.1\nName: {name}\nVersion: 1.0\n"
+        )
+    env = {"CI": "true"}
+    result = tox("-e", NATIVE_TOXENV, "--current-env", env=env, quiet=False)
+    line = next(l for l in result.stdout.splitlines() if "tox==" in l)
+    packages = line.rpartition(" ")[-1].split(",")
+    assert "MixedCase==1.0" in packages
+    assert "dotted.name==1.0" in packages
+    assert "Legacy==1.0" in packages
+    assert "mixedcase==1.0" not in packages
+
+
+def test_report_installed_is_cached(projdir):
+    env = {"CI": "true"}
+    _ = tox("-e", NATIVE_TOXENV, "--current-env", env=env)
+    cache_file = DOT_TOX / ".current-env" / "installed.json"
+    cached = json.loads(cache_file.read_text())
+    assert any(p.startswith("tox==") for p in cached["value"])
+    cached["value"] = ["cached==1.0"]
+    cache_file.write_text(json.dumps(cached))
+    result = tox("-e", NATIVE_TOXENV, "--current-env", env=env, quiet=False)
+    assert "cached==1.0" in result.stdout
+    assert "tox==" not in result.stdout
+
+
+def test_current_env_fork_server(projdir):
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["setenv"] += "\nFROM_TOX=yes"
+        config["testenv"]["commands"] = "\n".join((
+            "python -c 'import sys, os; print(\"fractions\" in sys.modules, sys.argv[1:], os.environ[\"FROM_TOX\"])' arg",
+            "python -m platform",
+            "echo not python",
+        ))
+    result = tox("-e", NATIVE_TOXENV, "--current-env", "--current-env-fork-server=fractions")
+    lines = result.stdout.splitlines()
+    assert lines[0] == "True ['arg'] yes"
+    assert lines[2] == "not python"
+
+
+def test_current_env_fork_server_exit_code(projdir):
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = "python -c 'raise SystemExit(3)'"
+    result = tox("-e", NATIVE_TOXENV, "--current-env", "--current-env-fork-server",
+                 check=False)
+    assert result.returncode == 3
+
+
+@pytest.mark.parametrize("parallel", [True, False])
+def test_current_env_parallel(projdir, parallel):
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = (
+            "python -c 'import os, tempfile; "
+            "print(os.environ[\"TOX_ENV_NAME\"], tempfile.gettempdir(), "
+            "os.environ.get(\"XDG_CACHE_HOME\"), "
+            "os.environ.get(\"PYTEST_XDIST_AUTO_NUM_WORKERS\"))'"
+        )
+    envs = envs_from_tox_ini()[:2]
+    args = ("-p", "all", "--parallel-live") if parallel else ()
+    result = tox("-e", ",".join(envs), "--current-env", *args,
+                 env={"XDG_CACHE_HOME": "/nonexistent"})
+    lines = sorted(l for l in result.stdout.splitlines() if l.startswith(tuple(f"{e} " for e in envs)))
+    assert len(lines) == 2
+    cpus = str(max(1, len(os.sched_getaffinity(0)) // 2))
+    for env, line in zip(envs, lines):
+        env_dir = (DOT_TOX / env).resolve()
+        if parallel:
+            expected = f"{env} {env_dir / 'tmp'} {env_dir / 'cache'} {cpus}"
+        else:
+            expected = f"{env} {tempfile.gettempdir()} /nonexistent None"
+        assert line == expected
+
+
+def test_current_env_durations_are_recorded(projdir):
+    envs = envs_from_tox_ini()[:2]
+    _ = tox("-e", ",".join(envs), "--current-env")
+    cache_file = DOT_TOX / ".current-env" / "durations.json"
+    recorded = json.loads(cache_file.read_text())["value"]
+    assert sorted(recorded) == sorted(envs)
+    assert all(seconds > 0 for seconds in recorded.values())
+
+
+@pytest.mark.parametrize("history", [True, False])
+def test_current_env_parallel_longest_first(projdir, history):
+    envs = envs_from_tox_ini()[:3]
+    if history:
+        cache_file = DOT_TOX / ".current-env" / "durations.json"
+        cache_file.parent.mkdir(parents=True)
+        durations = {envs[0]: 1.0, envs[1]: 10.0}
+        cache_file.write_text(json.dumps({"key": {"format": 1}, "value": durations}))
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = "python -c 'print(\"running {envname}\")'"
+    result = tox("-e", ",".join(envs), "--current-env", "-p", "1", "--parallel-live")
+    order = [l.split()[1] for l in result.stdout.splitlines() if l.startswith("running ")]
+    if history:
+        assert order == [envs[2], envs[1], envs[0]]
+    else:
+        assert order == envs
+
+
+def test_current_env_matching_only(projdir):
+    with modify_config(projdir / "tox.ini") as config:
+        config["tox"]["envlist"] = f"py27,{NATIVE_TOXENV},native,other"
+        config["testenv:native"] = {"base_python": f"python{PYTHON_VERSION_DOT}"}
+        config["testenv:other"] = {"base_python": "python2.7"}
+    result = tox("--current-env", "--current-env-matching-only")
+    ran = re.findall(r"^ +(\S+): OK", result.stdout, re.MULTILINE)
+    assert ran == [NATIVE_TOXENV, "native"]
+
+
+def test_current_env_matching_only_nothing_matches():
+    result = tox("-e", "py27", "--current-env", "--current-env-matching-only", check=False)
+    assert result.returncode > 0
+    assert "environment matches the current Python" in result.stdout
+
+
+def test_current_env_cache(projdir, tmp_path):
+    log = tmp_path / "runs"
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = f"python -c 'open(\"{log}\", \"a\").write(\"run\\n\")'"
+
+    def runs():
+        _ = tox("-e", NATIVE_TOXENV, "--current-env", "--current-env-cache")
+        return len(log.read_text().splitlines())
+
+    assert runs() == 1
+    assert runs() == 1
+    result = tox("-e", NATIVE_TOXENV, "--current-env", "--current-env-cache", quiet=False)
+    # The commands are shown, but not run
+    assert f"{NATIVE_TOXENV}: commands[0]> python -c" in result.stdout
+    assert f"{NATIVE_TOXENV}: cached: passed before" in result.stdout.splitlines()[-3]
+    assert runs() == 1
+    (projdir / "new_module.py").write_text("")
+    assert runs() == 2
+    assert runs() == 2
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["setenv"] = "FOO=bar"
+    assert runs() == 3
+    _ = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert len(log.read_text().splitlines()) == 4
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+def test_current_env_cache_ignores_build_output_and_ignored_files(projdir, tmp_path):
+    log = tmp_path / "runs"
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = f"python -c 'open(\"{log}\", \"a\").write(\"run\\n\")'"
+    (projdir / ".gitignore").write_text("*.log\n")
+
+    def runs():
+        _ = tox("-e", NATIVE_TOXENV, "--current-env", "--current-env-cache")
+        return len(log.read_text().splitlines())
+
+    assert runs() == 1
+    for dirname in ".venv", "build", "src/project.egg-info":
+        (projdir / dirname).mkdir(parents=True)
+        (projdir / dirname / "file.py").write_text("")
+    assert runs() == 1
+    subprocess.run(["git", "init", "-q"], cwd=projdir, check=True)
+    assert runs() == 1
+    (projdir / "output.log").write_text("")
+    assert runs() == 1
+    (projdir / "new_module.py").write_text("")
+    assert runs() == 2
+
+
+@pytest.mark.skipif(shutil.which("git") is None, reason="needs git")
+def test_current_env_cache_tracked_files_in_build_dirs_are_sources(projdir, tmp_path):
+    log = tmp_path / "runs"
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = f"python -c 'open(\"{log}\", \"a\").write(\"run\\n\")'"
+    module = projdir / "mypkg" / "build" / "core.py"
+    module.parent.mkdir(parents=True)
+    module.write_text("")
+    subprocess.run(["git", "init", "-q"], cwd=projdir, check=True)
+    subprocess.run(["git", "add", str(module)], cwd=projdir, check=True)
+
+    def runs():
+        _ = tox("-e", NATIVE_TOXENV, "--current-env", "--current-env-cache")
+        return len(log.read_text().splitlines())
+
+    assert runs() == 1
+    assert runs() == 1
+    module.write_text("raise SystemExit(1)\n")
+    assert runs() == 2
+
+
+def test_current_env_cache_failed_runs_are_not_cached(projdir):
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = "python -c 'raise SystemExit(1)'"
+    for _ in range(2):
+        result = tox("-e", NATIVE_TOXENV, "--current-env", "--current-env-cache",
+                     check=False)
+        assert result.returncode == 1
+        assert "cached" not in result.stdout
+
+
+@pytest.mark.parametrize("mode", ["--current-env", "--print-deps-to=-"])
+def test_trace(projdir, tmp_path, mode):
+    trace_file = tmp_path / "trace.json"
+    _ = tox("-e", NATIVE_TOXENV, mode, "--current-env-trace", str(trace_file))
+    events = json.loads(trace_file.read_text())["traceEvents"]
+    spans = [e for e in events if e["ph"] == "X"]
+    assert all(e["dur"] >= 0 for e in spans)
+    names = {e["name"] for e in spans}
+    assert {"tox_add_core_config", "tox_add_env_config", "CurrentEnv._get_python"} <= names
+    assert NATIVE_TOXENV in {
+        e["args"].get("env") for e in spans if e["name"] == "tox_add_env_config"
+    }
+    if mode == "--current-env":
+        (command,) = [e for e in spans if e["name"] == "command"]
+        assert command["args"]["exit_code"] == 0
+        assert "CurrentEnv.create_python_env" in names
+    else:
+        assert "PrintEnv.prepend_env_var_path" in names
+        assert "command" not in names
+
+
+def test_metrics(projdir, tmp_path):
+    metrics_file = tmp_path / "tox.prom"
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = "\n".join(
+            ["python -c pass", "python -c 'raise SystemExit(4)'"]
+        )
+    result = tox("-e", NATIVE_TOXENV, "--current-env",
+                 "--current-env-metrics", str(metrics_file), check=False)
+    assert result.returncode == 4
+    samples = {}
+    for line in metrics_file.read_text().splitlines():
+        if line.startswith("# TYPE "):
+            assert not line.endswith(" counter")
+        if not line.startswith("#"):
+            name, value = line.rsplit(" ", 1)
+            samples[name] = float(value)
+    env = f'env="{NATIVE_TOXENV}"'
+    assert samples[f"tox_current_env_commands{{{env}}}"] == 2
+    assert samples[f"tox_current_env_command_failures{{{env}}}"] == 1
+    assert samples[f"tox_current_env_exit_code{{{env}}}"] == 4
+    assert samples[f"tox_current_env_setup_duration_seconds{{{env}}}"] > 0
+    assert samples[f'tox_current_env_command_duration_seconds_bucket{{{env},le="+Inf"}}'] == 2
+    assert samples[f"tox_current_env_command_duration_seconds_sum{{{env}}}"] > 0
+    assert "tox_current_env_last_run_timestamp_seconds" in samples
+
+
+def test_runner_current_env(projdir):
+    result = tox("-e", NATIVE_TOXENV, "--current-env", "--runner", "current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["runner"] = "current-env"
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+
+
+@needs_importtime
+def test_plugin_is_not_imported_without_its_options(projdir):
+    imported = plugin_imports("l")
+    assert "tox_current_env.hooks4" in imported
+    assert imported <= {"tox_current_env", "tox_current_env.hooks", "tox_current_env.hooks4"}
+
+
+@needs_importtime
+def test_plugin_is_imported_with_its_options(projdir):
+    imported = plugin_imports("-e", NATIVE_TOXENV, "--current-env")
+    assert "tox_current_env.runner4" in imported
+
+
+def test_current_env_replaces_stale_python_symlink(projdir):
+    bindir = DOT_TOX / NATIVE_TOXENV / "bin"
+    bindir.mkdir(parents=True)
+    (bindir / "python").symlink_to("/nonexistent/python")
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert os.readlink(bindir / "python") == sys.executable
+
+
+def test_current_env_symlinks_are_kept_by_manifest(projdir):
+    tox("-e", NATIVE_TOXENV, "--current-env")
+    bindir = DOT_TOX / NATIVE_TOXENV / "bin"
+    marker = DOT_TOX / NATIVE_TOXENV / ".tox-current-env.json"
+    manifest = json.loads(marker.read_text())
+    assert manifest["mode"] == "current-env"
+    assert manifest["executable"] == sys.executable
+    before = (bindir / "python").lstat().st_mtime_ns
+    tox("-e", NATIVE_TOXENV, "--current-env")
+    assert (bindir / "python").lstat().st_mtime_ns == before
+
+    # A manifest for another interpreter means the symlinks are made again
+    marker.write_text(json.dumps({**manifest, "executable": "/nonexistent/python"}))
+    (bindir / "python").unlink()
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert os.readlink(bindir / "python") == sys.executable
+    assert json.loads(marker.read_text()) == manifest
+
+
+@pytest.mark.parametrize("tox_info", ("kept", "removed"))
+def test_regular_then_current_env(projdir, tox_info):
+    tox("-e", NATIVE_TOXENV)
+    envdir = DOT_TOX / NATIVE_TOXENV
+    marker = envdir / ".tox-current-env.json"
+    assert json.loads(marker.read_text())["mode"] == "regular"
+    assert (envdir / "pyvenv.cfg").exists()
+    if tox_info == "removed":
+        (envdir / ".tox-info.json").unlink()
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert json.loads(marker.read_text())["mode"] == "current-env"
+    assert not (envdir / "pyvenv.cfg").exists()
+
+
+def test_recreate_moves_environment_to_trash(projdir):
+    tox("-e", NATIVE_TOXENV)
+    assert (DOT_TOX / NATIVE_TOXENV / "pyvenv.cfg").exists()
+    result = tox("-re", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert not (DOT_TOX / NATIVE_TOXENV / "pyvenv.cfg").exists()
+    assert (DOT_TOX / ".current-env" / "trash").is_dir()
+
+
+def test_trash_leftovers_are_reaped(projdir):
+    leftover = DOT_TOX / ".current-env" / "trash" / "py-leftover" / "py"
+    leftover.mkdir(parents=True)
+    (leftover / "file").write_text("")
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == NATIVE_EXEC_PREFIX_MSG
+    assert not leftover.exists()
+
+
+def _tamper_resolved_config(toxenv, **values):
+    cache_file = DOT_TOX / ".current-env" / f"resolved-{toxenv}.json"
+    cached = json.loads(cache_file.read_text())
+    cached["value"].update(values)
+    cache_file.write_text(json.dumps(cached))
+
+
+def test_current_env_interpreter_facts_are_cached(projdir, tmp_path):
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = "python -c 'import os; print(os.environ[\"PATH\"])'"
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert str(tmp_path) not in result.stdout.splitlines()[0].split(os.pathsep)
+    cache_file = DOT_TOX / ".current-env" / "interpreter.json"
+    cached = json.loads(cache_file.read_text())
+    cached["value"]["scripts"] = str(tmp_path)
+    cache_file.write_text(json.dumps(cached))
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert str(tmp_path) in result.stdout.splitlines()[0].split(os.pathsep)
+
+
+def _other_python_version():
+    """X.Y of another python3 available in $PATH"""
+    others = [
+        f"3.{minor}"
+        for minor in range(6, 14)
+        if f"3.{minor}" != PYTHON_VERSION_DOT and is_available(f"python3.{minor}")
+    ]
+    if not others:
+        pytest.skip("This test needs another python3.X available in $PATH")
+    return others[0]
+
+
+def test_current_env_interpreters(projdir):
+    other = _other_python_version()
+    other_env = "py" + other.replace(".", "")
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["commands"] = (
+            "python -c 'import os, sys; "
+            "print(os.environ[\"TOX_ENV_NAME\"], \".\".join(map(str, sys.version_info[:2])))'"
+        )
+    envs = f"{NATIVE_TOXENV},{other_env}"
+    result = tox("-e", envs, "--current-env", "--current-env-interpreters")
+    lines = [l for l in result.stdout.splitlines() if re.match(r"^py\d+ \d+\.\d+$", l)]
+    assert lines == [f"{NATIVE_TOXENV} {PYTHON_VERSION_DOT}", f"{other_env} {other}"]
+    assert os.path.realpath(DOT_TOX / other_env / "bin" / "python") != os.path.realpath(sys.executable)
+    # The other interpreter is looked up once, later runs use the cached facts
+    cached = list((DOT_TOX / ".current-env").glob("interpreter-*.json"))
+    assert cached
+    mtimes = [f.stat().st_mtime_ns for f in cached]
+    _ = tox("-e", other_env, "--current-env", "--current-env-interpreters")
+    assert [f.stat().st_mtime_ns for f in cached] == mtimes
+
+
+def test_current_env_interpreters_resolved_commands(projdir):
+    other = _other_python_version()
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv:other"] = {
+            "base_python": f"python{other}",
+            "commands": "python -c 'import os, sys; "
+            "print(\"ENVPYTHON\", os.path.realpath(sys.argv[1]) == os.path.realpath(sys.executable))' "
+            "{envpython}",
+        }
+    for args in ((), ("--current-env-interpreters",), ()):
+        result = tox("-e", "other", "--current-env", *args)
+        assert "ENVPYTHON True" in result.stdout.splitlines()
+
+
+def test_current_env_interpreters_missing(projdir):
+    result = tox("-e", "py34", "--current-env", "--current-env-interpreters", check=False)
+    assert "py34: SKIP" in result.stdout
+    assert result.returncode > 0
+
+
+def test_current_env_interpreter_query_imports_only_the_standard_library(projdir, tmp_path):
+    from tox_current_env import interpreter
+
+    python = tmp_path / "python"
+    python.symlink_to(sys.executable)
+    (projdir / "platform.py").write_text("raise SystemExit(1)\n")
+    found = interpreter.facts(executable=str(python))
+    assert found is not None
+    assert found["version_info"] == list(sys.version_info)
+    assert "" not in found["path"]
+    assert os.path.dirname(interpreter.__file__) not in found["path"]
+
+
+def test_print_deps_resolved_config_is_cached(projdir):
+    _ = tox("-e", NATIVE_TOXENV, "--print-deps-to", "-")
+    _tamper_resolved_config(NATIVE_TOXENV, deps=["cached"])
+    result = tox("-e", NATIVE_TOXENV, "--print-deps-to", "-")
+    assert result.stdout.splitlines()[:2] == ["tox", "cached"]
+
+
+def test_print_deps_resolved_config_cache_invalidated(projdir):
+    _ = tox("-e", NATIVE_TOXENV, "--print-deps-to", "-")
+    _tamper_resolved_config(NATIVE_TOXENV, deps=["cached"])
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["deps"] = "six"
+    result = tox("-e", NATIVE_TOXENV, "--print-deps-to", "-")
+    assert result.stdout.splitlines()[:2] == ["tox", "six"]
+
+
+def test_print_deps_resolved_config_cache_env_vars(projdir):
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["deps"] = "{env:DEP_FROM_ENV:six}"
+    result = tox("-e", NATIVE_TOXENV, "--print-deps-to", "-")
+    assert result.stdout.splitlines()[:2] == ["tox", "six"]
+    result = tox(
+        "-e", NATIVE_TOXENV, "--print-deps-to", "-", env={"DEP_FROM_ENV": "attrs"}
+    )
+    assert result.stdout.splitlines()[:2] == ["tox", "attrs"]
+
+
+def test_current_env_resolved_commands_are_cached(projdir):
+    _ = tox("-e", NATIVE_TOXENV, "--current-env")
+    _tamper_resolved_config(
+        NATIVE_TOXENV, commands=[["python", "-c", "print('from cache')"]]
+    )
+    result = tox("-e", NATIVE_TOXENV, "--current-env")
+    assert result.stdout.splitlines()[0] == "from cache"
+
+
 def test_assert_config_option_with_config(projdir):
     result = tox("-l", "--assert-config", check=False)
     assert result.returncode == 0
@@ -642,3 +1323,139 @@ def test_assert_config_option_with_pyproject_toml_native(projdir):
     """))
     result = tox("-l", "--assert-config", check=False)
     assert result.returncode == 0
+
+
+def test_api_resolve(projdir):
+    from tox_current_env import resolve
+
+    results = resolve(projdir, envs=[NATIVE_TOXENV])
+    assert list(results) == [NATIVE_TOXENV]
+    result = results[NATIVE_TOXENV]
+    assert result.requires == ["tox"]
+    assert result.deps == ["six", "py"]
+    assert sorted(result.extras) == ["dev", "full"]
+    if (TOX_VERSION.major, TOX_VERSION.minor) >= (4, 22):
+        assert result.dependency_groups == ["dg1"]
+    assert not DOT_TOX.exists()
+
+
+def test_api_resolver_is_reusable(projdir):
+    from tox_current_env import Resolver
+
+    resolver = Resolver(projdir)
+    assert resolver.envs == envs_from_tox_ini()
+    results = resolver.resolve()
+    assert list(results) == envs_from_tox_ini()
+    assert all(result.deps == ["six", "py"] for result in results.values())
+    assert resolver.resolve([NATIVE_TOXENV]) == {NATIVE_TOXENV: results[NATIVE_TOXENV]}
+    with pytest.raises(LookupError):
+        resolver.resolve(["py27"])
+
+
+def test_server_query(projdir, tmp_path):
+    sock = tmp_path / "server.sock"
+    server = subprocess.Popen(
+        (sys.executable, "-m", "tox_current_env", "serve", "--socket", str(sock))
+    )
+    query = (
+        sys.executable, "-m", "tox_current_env", "query", "--socket", str(sock),
+        "-e", NATIVE_TOXENV, "--print-deps-to", "-", str(projdir),
+    )
+    try:
+        for _ in range(300):
+            if sock.exists():
+                break
+            time.sleep(0.1)
+        result = subprocess.run(query, stdout=subprocess.PIPE, encoding="utf-8", check=True)
+        assert result.stdout == "tox\nsix\npy\n"
+
+        # the configuration is reloaded when changed
+        with modify_config(projdir / "tox.ini") as config:
+            config["testenv"]["deps"] += "\nattrs"
+        result = subprocess.run(query, stdout=subprocess.PIPE, encoding="utf-8", check=True)
+        assert result.stdout == "tox\nsix\npy\nattrs\n"
+    finally:
+        server.terminate()
+        server.wait()
+    assert not sock.exists()
+
+
+def _sorted_extras(results):
+    return {
+        name: result._replace(extras=sorted(result.extras))
+        for name, result in results.items()
+    }
+
+
+def test_static_resolve_matches_tox(projdir):
+    from tox_current_env import resolve, static
+
+    with modify_config(projdir / "tox.ini") as config:
+        config["tox"]["requires"] = "setuptools >= 40"
+        config["testenv"]["deps"] = "six\n{py38,py39}: py\n!py310: attrs # comment"
+        config[f"testenv:{NATIVE_TOXENV}"] = {"extras": "Full_Thing, dev"}
+    assert _sorted_extras(static.resolve(projdir)) == _sorted_extras(resolve(projdir))
+
+
+def test_static_resolve_toml_matches_tox(projdir):
+    from tox_current_env import resolve, static
+
+    (projdir / "tox.ini").unlink()
+    (projdir / "tox.toml").write_text(textwrap.dedent(f"""
+        env_list = ["{NATIVE_TOXENV}", "lint"]
+        min_version = "4.1"
+        [env_run_base]
+        deps = ["six", "py"]
+        dependency_groups = ["Dg_1"]
+        [env.lint]
+        deps = ["flake8"]
+    """))
+    assert static.resolve(projdir) == resolve(projdir)
+
+
+@pytest.mark.parametrize(
+    "deps", ["{env:DEPS:six}", "-r requirements.txt", "{[base]deps}"]
+)
+def test_static_resolve_unsupported(projdir, deps):
+    from tox_current_env import static
+
+    with modify_config(projdir / "tox.ini") as config:
+        config["testenv"]["deps"] = deps
+    with pytest.raises(static.Unsupported):
+        static.resolve(projdir)
+
+
+@pytest.mark.parametrize("static_config", [True, False])
+def test_print_command(projdir, static_config):
+    if not static_config:
+        with modify_config(projdir / "tox.ini") as config:
+            config["testenv"]["deps"] = "{env:NO_SUCH_VARIABLE:six}\npy"
+    result = subprocess.run(
+        (sys.executable, "-m", "tox_current_env", "print", "-e", NATIVE_TOXENV,
+         "--print-deps-to", "-"),
+        stdout=subprocess.PIPE, encoding="utf-8", check=True,
+    )
+    assert result.stdout.splitlines() == ["tox", "six", "py"]
+    assert not DOT_TOX.exists()
+
+
+def test_batch(projdir, tmp_path):
+    root = tmp_path / "projects"
+    for name in "a", "nested/b", ".hidden":
+        shutil.copytree(projdir, root / name)
+    (root / "broken").mkdir()
+    (root / "broken" / "tox.ini").write_text("[tox]\nrequires = not a requirement !\n")
+    output = tmp_path / "results.jsonl"
+    result = subprocess.run(
+        (sys.executable, "-m", "tox_current_env", "batch", "--discover", str(root),
+         "-e", NATIVE_TOXENV, "--output", str(output)),
+    )
+    assert result.returncode == 1
+    results = [json.loads(line) for line in output.read_text().splitlines()]
+    assert [r["project_dir"] for r in results] == [
+        str(root / "a"), str(root / "broken"), str(root / "nested" / "b"),
+    ]
+    for r in results[0], results[2]:
+        assert r["results"][NATIVE_TOXENV]["deps"] == ["six", "py"]
+        assert sorted(r["results"][NATIVE_TOXENV]["extras"]) == ["dev", "full"]
+    assert "error" in results[1]
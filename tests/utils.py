@@ -133,3 +133,57 @@ needs_all_pythons = pytest.mark.skipif(
     not all((is_available(f"python3.{x}") for x in range(6, 12))),
     reason="This test needs all pythons from 3.6 to 3.11 available in $PATH",
 )
+
+needs_importtime = pytest.mark.skipif(
+    sys.version_info < (3, 7),
+    reason="This test needs -X importtime from Python 3.7",
+)
+
+needs_audit_hooks = pytest.mark.skipif(
+    sys.version_info < (3, 8),
+    reason="This test needs sys.addaudithook from Python 3.8",
+)
+
+
+def plugin_imports(*args):
+    """Run tox with the given arguments and return the modules of this plugin it imported"""
+    cp = subprocess.run(
+        (sys.executable, "-X", "importtime", "-m", "tox") + args,
+        encoding="utf-8",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        check=True,
+    )
+    result = set()
+    for line in cp.stderr.splitlines():
+        if line.startswith("import time:") and "tox_current_env" in line:
+            result.add(line.split("|")[-1].strip())
+    return result
+
+
+def interpreter_queries(*args):
+    """Run tox with the given arguments and return the interpreters
+    it ran to learn about them (tox 3 runs a helper script for that)"""
+    code = (
+        "import runpy, sys\n"
+        "def hook(event, args):\n"
+        "    if event == 'subprocess.Popen' and 'get_version.py' in str(args[1]):\n"
+        "        print('QUERIED', args[0], file=sys.stderr)\n"
+        "sys.addaudithook(hook)\n"
+        "sys.argv[0] = 'tox'\n"
+        "runpy.run_module('tox', run_name='__main__')\n"
+    )
+    cp = subprocess.run(
+        (sys.executable, "-c", code, "-q") + args,
+        encoding="utf-8",
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+    )
+    print(cp.stdout, file=sys.stdout)
+    print(cp.stderr, file=sys.stderr)
+    cp.check_returncode()
+    return [
+        line.split(" ", 1)[1]
+        for line in cp.stderr.splitlines()
+        if line.startswith("QUERIED ")
+    ]